@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import json
 import argparse
+import sys
 import statistics
 import math
 from scipy import stats
@@ -16,6 +17,8 @@ def confidence_interval(data, confidence=0.95):
 
 
 def format_mean_confidence_interval(data):
+    if not data:
+        return "—"
     lo, hi = confidence_interval(data)
     mean = statistics.mean(data)
     if lo == hi:
@@ -23,9 +26,80 @@ def format_mean_confidence_interval(data):
     return f"{mean:.2f} ± {hi - mean:.2f}"
 
 
-def extract_tests(data):
+def load_npz_results(path):
+    """Read a results file written by run.py --npz into the same structure as a JSON results file."""
+    # NumPy is only needed for .npz files.
+    import numpy as np
+
+    with np.load(path) as npz:
+        columns = {name: npz[name] for name in npz.files}
+    paths = columns["paths"]
+    depths = (paths != "").sum(axis=1)
+    metric_count = len(columns["metrics"])
+    score_metric = list(columns["metrics"]).index("score")
+
+    def build(mask):
+        data = {"test_results": {}, "benchmark_totals": {}, "measurements": {"paths": [], "values": []}}
+        path_index = columns["path_index"][mask]
+        metric_index = columns["metric_index"][mask]
+        # Group the rows by path and metric, with each group's values in iteration order.
+        order = np.lexsort((columns["iteration"][mask], metric_index, path_index))
+        path_index, metric_index, values = path_index[order], metric_index[order], columns["values"][mask][order]
+        keys = path_index.astype(np.int64) * metric_count + metric_index
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=np.int64)
+        for start, group in zip(starts, np.split(values, starts[1:])):
+            path = [str(part) for part in paths[path_index[start]][:depths[path_index[start]]]]
+            group_values = group.tolist()
+            if len(path) == 1:
+                key = "score" if metric_index[start] == score_metric else "totalTime"
+                data["benchmark_totals"].setdefault(path[0], {})[key] = group_values
+                continue
+            data["measurements"]["paths"].append(path)
+            data["measurements"]["values"].append(group_values)
+            if len(path) == 3:
+                data["test_results"].setdefault(path[0], {}).setdefault(path[1], {})[path[2]] = group_values
+        return data
+
+    arms = {}
+    for arm_index, arm in enumerate(columns["arms"]):
+        in_arm = columns["arm_index"] == arm_index
+        data = build(in_arm)
+        data["phases"] = {str(phase): build(in_arm & (columns["phase_index"] == phase_index))
+                          for phase_index, phase in enumerate(columns["phases"])}
+        arms[str(arm)] = data
+    if len(arms) == 1:
+        return next(iter(arms.values()))
+    return {"arms": arms}
+
+
+def load_results(path):
+    if path.endswith(".npz"):
+        return load_npz_results(path)
+    # Runs stored with results_db.py are given as <database>:<run name>.
+    import results_db
+    if results_db.split_database_source(path):
+        return results_db.load_database_results(path)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def extract_tests(data, steps=False):
     rows = []
 
+    # Newer results files record every level of the results, including each test's Sync and Async steps.
+    if steps and "measurements" in data:
+        measurements = data["measurements"]
+        for path, values in zip(measurements["paths"], measurements["values"]):
+            if len(path) < 3 or not values:
+                continue
+            rows.append({
+                "benchmark": path[0],
+                "suite": path[1],
+                "test": "/".join(path[2:]),
+                "values": values,
+            })
+        return rows
+
     for benchmark, suites in data["test_results"].items():
         for suite_name, tests in suites.items():
             for test_name, values_list in tests.items():
@@ -47,19 +121,84 @@ def extract_scores(data):
     return data.get("benchmark_totals", {})
 
 
+def select_phase(data, phase):
+    # run.py additionally records each process's first iteration under "cold" and the rest under "warm".
+    if not phase:
+        return data
+    return data.get("phases", {}).get(phase, {"test_results": {}, "benchmark_totals": {}})
+
+
+def result_hosts(data):
+    """Return the hosts that ran Ladybird for a results file: a coordinator's workers, or the host run.py ran on."""
+    metadata = data.get("metadata", {})
+    workers = metadata.get("workers")
+    if workers:
+        return [worker["host"] for worker in workers.values() if worker.get("host")]
+    return [metadata["host"]] if metadata.get("host") else []
+
+
+def host_differences(old_data, new_data):
+    """Describe how the hosts recorded in the metadata of two results files differ, if their fingerprints do."""
+    from run import HOST_FINGERPRINT_KEYS
+
+    old_hosts = result_hosts(old_data)
+    new_hosts = result_hosts(new_data)
+    if not old_hosts or not new_hosts:
+        return []
+    if {host.get("fingerprint") for host in old_hosts} == {host.get("fingerprint") for host in new_hosts}:
+        return []
+    differences = []
+    for key in HOST_FINGERPRINT_KEYS:
+        old_values = sorted({str(host.get(key)) for host in old_hosts})
+        new_values = sorted({str(host.get(key)) for host in new_hosts})
+        if old_values != new_values:
+            differences.append(f"{key}: {', '.join(old_values)} vs. {', '.join(new_values)}")
+    return differences
+
+
+def format_paired_speedup(old_vals, new_vals):
+    # Runs interleaved with run.py --executable-b pair up in order, so per-pair ratios cancel out drift between them.
+    if not old_vals or len(old_vals) != len(new_vals) or 0 in new_vals:
+        return "—"
+    return format_mean_confidence_interval([old / new for old, new in zip(old_vals, new_vals)])
+
+
 def main():
     parser = argparse.ArgumentParser(description="Compare JavaScript benchmark results (old vs new).")
-    parser.add_argument("-o", "--old", required=True, help="Old JSON results file.")
-    parser.add_argument("-n", "--new", required=True, help="New JSON results file.")
+    parser.add_argument("-o", "--old",
+                        help="Old results file (.json, .npz from run.py --npz, or <database>:<run name> from results_db.py).")
+    parser.add_argument("-n", "--new",
+                        help="New results file (.json, .npz from run.py --npz, or <database>:<run name> from results_db.py).")
+    parser.add_argument("--ab", help="Results file from run.py --executable-b; compares arm A (old) with arm B (new).")
+    parser.add_argument("--steps", action="store_true",
+                        help="Also compare the steps of each test, such as Sync and Async, where the results record them")
+    parser.add_argument("--phase", choices=["cold", "warm"],
+                        help="Only compare the first iteration of each Ladybird process (cold) or the remaining ones (warm)")
     args = parser.parse_args()
 
-    with open(args.old, "r") as f:
-        old_data = json.load(f)
-    with open(args.new, "r") as f:
-        new_data = json.load(f)
-
-    old_tests = { (r["benchmark"], r["suite"], r["test"]): r["values"] for r in extract_tests(old_data) }
-    new_tests = { (r["benchmark"], r["suite"], r["test"]): r["values"] for r in extract_tests(new_data) }
+    if args.ab:
+        if args.old or args.new:
+            parser.error("--ab cannot be combined with --old or --new")
+        arms = load_results(args.ab)["arms"]
+        old_data = arms["A"]
+        new_data = arms["B"]
+    elif args.old and args.new:
+        old_data = load_results(args.old)
+        new_data = load_results(args.new)
+        differences = host_differences(old_data, new_data)
+        if differences:
+            print("Warning: The results come from hosts with different fingerprints, so they may not be comparable:",
+                  file=sys.stderr)
+            for difference in differences:
+                print(f"  {difference}", file=sys.stderr)
+    else:
+        parser.error("either --old and --new, or --ab, is required")
+
+    old_data = select_phase(old_data, args.phase)
+    new_data = select_phase(new_data, args.phase)
+
+    old_tests = { (r["benchmark"], r["suite"], r["test"]): r["values"] for r in extract_tests(old_data, args.steps) }
+    new_tests = { (r["benchmark"], r["suite"], r["test"]): r["values"] for r in extract_tests(new_data, args.steps) }
 
     table = []
 
@@ -82,16 +221,22 @@ def main():
             old_str = format_mean_confidence_interval(old_vals)
             new_str = format_mean_confidence_interval(new_vals)
 
-        table.append([
+        row = [
             benchmark,
             suite,
             test,
             speedup,
             old_str,
             new_str
-        ])
+        ]
+        if args.ab:
+            row.append(format_paired_speedup(old_vals, new_vals))
+        table.append(row)
 
-    print(tabulate(table, headers=["Benchmark", "Suite", "Test", "Speedup", "Old (Mean ± Range)", "New (Mean ± Range)"]))
+    headers = ["Benchmark", "Suite", "Test", "Speedup", "Old (Mean ± Range)", "New (Mean ± Range)"]
+    if args.ab:
+        headers.append("Paired Speedup")
+    print(tabulate(table, headers=headers))
 
     old_scores = extract_scores(old_data)
     new_scores = extract_scores(new_data)
@@ -121,7 +266,7 @@ def main():
             new_time_mean = statistics.mean(new_time)
             speedup = f"{old_time_mean / new_time_mean:.3f}" if new_time_mean else "—"
 
-        score_table.append([
+        row = [
             bench,
             format_mean_confidence_interval(old_score),
             format_mean_confidence_interval(new_score),
@@ -129,21 +274,24 @@ def main():
             format_mean_confidence_interval(old_time),
             format_mean_confidence_interval(new_time),
             speedup or "—",
-        ])
-
+        ]
+        if args.ab:
+            row.append(format_paired_speedup(old_time, new_time))
+        score_table.append(row)
+
+    headers = [
+        "Benchmark",
+        "Old Score",
+        "New Score",
+        "Score Improvement",
+        "Old Total Time (ms)",
+        "New Total Time (ms)",
+        "Speedup"
+    ]
+    if args.ab:
+        headers.append("Paired Speedup")
     print()
-    print(tabulate(
-        score_table,
-        headers=[
-            "Benchmark",
-            "Old Score",
-            "New Score",
-            "Score Improvement",
-            "Old Total Time (ms)",
-            "New Total Time (ms)",
-            "Speedup"
-        ],
-    ))
+    print(tabulate(score_table, headers=headers))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+
+from pathlib import Path
+from run import PACK_MAGIC, PACK_INDEX_LENGTH_SIZE, load_asset_cache
+
+
+def write_pack(benchmark_path, pack_path):
+    """Pack every file below benchmark_path into a single uncompressed file, returning the number of files packed.
+
+    Index-page aliases such as "/" share their target's data, and precompressed variants from precompress.py are
+    packed alongside the file they encode.
+    """
+    assets = load_asset_cache(benchmark_path)
+    chunks = []
+    data_size = 0
+    offsets = {}
+
+    def append(body):
+        nonlocal data_size
+        chunks.append(body)
+        offset = data_size
+        data_size += len(body)
+        return offset
+
+    files = {}
+    for url_path, asset in assets.items():
+        if id(asset) not in offsets:
+            offsets[id(asset)] = {
+                "offset": append(asset.body),
+                "length": len(asset.body),
+                "content_type": asset.content_type,
+                "etag": asset.etags["identity"],
+                "last_modified": asset.last_modified,
+                "encodings": {
+                    encoding: {"offset": append(body), "length": len(body), "etag": asset.etags[encoding]}
+                    for encoding, body in asset.encoded_bodies.items()
+                },
+            }
+        files[url_path] = offsets[id(asset)]
+
+    index = json.dumps({"benchmark": benchmark_path.name, "files": files}, separators=(",", ":")).encode("utf-8")
+
+    temporary_path = pack_path.with_name(pack_path.name + ".tmp")
+    with open(temporary_path, "wb") as f:
+        f.write(PACK_MAGIC)
+        f.write(len(index).to_bytes(PACK_INDEX_LENGTH_SIZE, "little"))
+        f.write(index)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(temporary_path, pack_path)
+    return len(offsets)
+
+
+def main():
+    benchmarks_dir = Path(__file__).parent / "benchmarks"
+
+    parser = argparse.ArgumentParser(description="Pack benchmarks into single files for run.py --serve-from archive.")
+    parser.add_argument("--benchmarks", type=str, help="Benchmarks to pack (comma-separated)", default="all")
+    parser.add_argument("--output-dir", type=Path, default=Path(__file__).parent / "packed",
+                        help="Directory the <Benchmark>.pack files are written to")
+    args = parser.parse_args()
+
+    if args.benchmarks == "all":
+        benchmark_paths = sorted(path for path in benchmarks_dir.iterdir() if path.is_dir())
+    else:
+        benchmark_paths = [benchmarks_dir / name for name in args.benchmarks.split(",")]
+    for benchmark_path in benchmark_paths:
+        if not benchmark_path.is_dir():
+            print(f"Benchmark '{benchmark_path.name}' not found in benchmarks directory.", file=sys.stderr)
+            sys.exit(1)
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    for benchmark_path in benchmark_paths:
+        pack_path = args.output_dir / f"{benchmark_path.name}.pack"
+        file_count = write_pack(benchmark_path, pack_path)
+        print(f"{benchmark_path.name}: packed {file_count} files into '{pack_path}' ({pack_path.stat().st_size / (1024 * 1024):.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
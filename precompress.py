@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import argparse
+import gzip
+import os
+import sys
+
+from pathlib import Path
+from run import CONTENT_ENCODING_SUFFIXES, guess_content_type
+
+try:
+    from compression import zstd
+
+    def zstd_compress(data):
+        return zstd.compress(data, level=19)
+except ImportError:
+    try:
+        import zstandard
+
+        def zstd_compress(data):
+            return zstandard.ZstdCompressor(level=19).compress(data)
+    except ImportError:
+        zstd_compress = None
+
+
+TEXT_CONTENT_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/manifest+json",
+    "application/wasm",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+def is_text_asset(path):
+    content_type = guess_content_type(path.name)
+    return content_type.startswith("text/") or content_type in TEXT_CONTENT_TYPES
+
+
+def available_compressors():
+    compressors = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if zstd_compress:
+        compressors["zstd"] = zstd_compress
+    return compressors
+
+
+def precompress_file(path, compressors, min_size):
+    """Write compressed siblings of path, returning the number of variants written.
+
+    A variant is only kept when it is smaller than the original, so the server never prefers a larger encoding.
+    Variants that are newer than the original are left alone.
+    """
+    written = 0
+    source_stat = path.stat()
+    data = None
+    for encoding, compress in compressors.items():
+        variant_path = path.with_name(path.name + CONTENT_ENCODING_SUFFIXES[encoding])
+        if variant_path.exists() and variant_path.stat().st_mtime >= source_stat.st_mtime:
+            continue
+        if data is None:
+            data = path.read_bytes()
+        compressed = compress(data) if len(data) >= min_size else None
+        if compressed is None or len(compressed) >= len(data):
+            variant_path.unlink(missing_ok=True)
+            continue
+        variant_path.write_bytes(compressed)
+        os.utime(variant_path, (source_stat.st_atime, source_stat.st_mtime))
+        written += 1
+    return written
+
+
+def find_assets(root):
+    variant_suffixes = tuple(CONTENT_ENCODING_SUFFIXES.values())
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if file_name.endswith(variant_suffixes):
+                continue
+            yield Path(dir_path) / file_name
+
+
+def remove_variants(root):
+    removed = 0
+    variant_suffixes = tuple(CONTENT_ENCODING_SUFFIXES.values())
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            if not file_name.endswith(variant_suffixes):
+                continue
+            source_path = Path(dir_path) / file_name.rsplit(".", 1)[0]
+            if source_path.is_file():
+                (Path(dir_path) / file_name).unlink()
+                removed += 1
+    return removed
+
+
+def main():
+    benchmarks_dir = Path(__file__).parent / "benchmarks"
+
+    parser = argparse.ArgumentParser(description="Precompute compressed variants of benchmark text assets for run.py --content-encodings.")
+    parser.add_argument("--benchmarks", type=str, help="Benchmarks to precompress (comma-separated)", default="all")
+    parser.add_argument("--encodings", type=str, default=",".join(available_compressors()),
+                        help="Encodings to produce (comma-separated)")
+    parser.add_argument("--min-size", type=int, default=256, help="Files smaller than this many bytes are not compressed")
+    parser.add_argument("--clean", action="store_true", help="Remove previously generated variants instead")
+    args = parser.parse_args()
+
+    if args.benchmarks == "all":
+        benchmark_paths = sorted(path for path in benchmarks_dir.iterdir() if path.is_dir())
+    else:
+        benchmark_paths = [benchmarks_dir / name for name in args.benchmarks.split(",")]
+    for benchmark_path in benchmark_paths:
+        if not benchmark_path.is_dir():
+            print(f"Benchmark '{benchmark_path.name}' not found in benchmarks directory.", file=sys.stderr)
+            sys.exit(1)
+
+    if args.clean:
+        for benchmark_path in benchmark_paths:
+            print(f"{benchmark_path.name}: removed {remove_variants(benchmark_path)} variants")
+        return
+
+    compressors = available_compressors()
+    for encoding in args.encodings.split(","):
+        if encoding not in CONTENT_ENCODING_SUFFIXES:
+            print(f"Error: Unknown encoding '{encoding}'.", file=sys.stderr)
+            sys.exit(1)
+        if encoding not in compressors:
+            print(f"Error: No {encoding} compressor available; install the 'zstandard' module or use Python 3.14+.", file=sys.stderr)
+            sys.exit(1)
+    compressors = {encoding: compressors[encoding] for encoding in args.encodings.split(",")}
+
+    for benchmark_path in benchmark_paths:
+        assets = [path for path in find_assets(benchmark_path) if is_text_asset(path)]
+        written = sum(precompress_file(path, compressors, args.min_size) for path in assets)
+        print(f"{benchmark_path.name}: wrote {written} variants for {len(assets)} text assets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from pathlib import Path
+from compare import format_mean_confidence_interval, load_results
+from tabulate import tabulate
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS executables (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    executable_id INTEGER REFERENCES executables (id),
+    started_at REAL NOT NULL,
+    completed_at REAL,
+    source TEXT,
+    UNIQUE (name, arm)
+);
+CREATE TABLE IF NOT EXISTS benchmarks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tests (
+    id INTEGER PRIMARY KEY,
+    benchmark_id INTEGER NOT NULL REFERENCES benchmarks (id),
+    path TEXT NOT NULL UNIQUE,
+    parts TEXT NOT NULL,
+    depth INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    test_id INTEGER NOT NULL REFERENCES tests (id),
+    metric TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    phase TEXT,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, test_id, metric, iteration)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS samples_by_test ON samples (test_id, run_id);
+CREATE INDEX IF NOT EXISTS runs_by_start ON runs (started_at);
+"""
+
+# Database sources are given to compare.py as <database>:<run name>.
+DATABASE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+class ResultsDatabase:
+    """SQLite store of the results of many runs.
+
+    Every value recorded by run.py is a sample of one metric ("total" or "score") of one test, identified by its full
+    path such as Speedometer3/TodoMVC-React/Adding100Items/Sync, in one iteration of one run. A benchmark's own total
+    time and score are samples of the test whose path is just the benchmark's name. A/B runs are stored as one run per
+    arm, sharing the run's name.
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.test_ids = {}
+        self.iteration_counts = {}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def begin_run(self, name, arm, executable, started_at, source=None, replace=False):
+        with self.lock, self.connection:
+            existing = self.connection.execute("SELECT id FROM runs WHERE name = ? AND arm = ?", (name, arm)).fetchone()
+            if existing:
+                if not replace:
+                    raise ValueError(f"Run '{name}' (arm {arm}) is already in the database")
+                self.connection.execute("DELETE FROM runs WHERE id = ?", existing)
+            executable_id = None
+            if executable:
+                self.connection.execute("INSERT OR IGNORE INTO executables (path) VALUES (?)", (str(executable),))
+                executable_id = self.connection.execute("SELECT id FROM executables WHERE path = ?",
+                                                        (str(executable),)).fetchone()[0]
+            cursor = self.connection.execute(
+                "INSERT INTO runs (name, arm, executable_id, started_at, source) VALUES (?, ?, ?, ?, ?)",
+                (name, arm, executable_id, started_at, source))
+            return cursor.lastrowid
+
+    def complete_run(self, run_id, completed_at=None):
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE runs SET completed_at = ? WHERE id = ?",
+                                    (completed_at if completed_at is not None else datetime.datetime.now().timestamp(), run_id))
+
+    def test_id(self, path):
+        if path not in self.test_ids:
+            self.connection.execute("INSERT OR IGNORE INTO benchmarks (name) VALUES (?)", (path[0],))
+            self.connection.execute(
+                "INSERT OR IGNORE INTO tests (benchmark_id, path, parts, depth) "
+                "SELECT id, ?, ?, ? FROM benchmarks WHERE name = ?",
+                ("/".join(path), json.dumps(list(path)), len(path), path[0]))
+            self.test_ids[path] = self.connection.execute("SELECT id FROM tests WHERE path = ?",
+                                                          ("/".join(path),)).fetchone()[0]
+        return self.test_ids[path]
+
+    def add_results(self, run_id, results):
+        """Append results, in the form run.py records them, to the samples of a run.
+
+        results["measurements"] maps paths to values, results["benchmark_totals"] holds each benchmark's total time
+        and score, and results["iteration_phases"] the phase of each of the benchmark's iterations. Values follow any
+        samples already added to the run, so a run can be streamed into the database one iteration at a time.
+        """
+        iteration_phases = results.get("iteration_phases", {})
+        series = [((benchmark,), metric, totals.get(key, []))
+                  for benchmark, totals in results["benchmark_totals"].items()
+                  for metric, key in (("total", "totalTime"), ("score", "score"))]
+        series += [(path, "total", values) for path, values in results.get("measurements", {}).items()]
+        with self.lock, self.connection:
+            for path, metric, values in series:
+                test_id = self.test_id(path)
+                phases = iteration_phases.get(path[0], [])
+                first_iteration = self.iteration_counts.get((run_id, test_id, metric), 0)
+                self.connection.executemany(
+                    "INSERT INTO samples (run_id, test_id, metric, iteration, phase, value) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(run_id, test_id, metric, first_iteration + index, phases[index] if index < len(phases) else None, value)
+                     for index, value in enumerate(values)])
+                self.iteration_counts[(run_id, test_id, metric)] = first_iteration + len(values)
+
+    def runs(self, name=None, arm=None, executable=None, since=None, include_incomplete=False, last=None):
+        """Return the runs matching every given filter, oldest first; executable is a glob pattern."""
+        conditions, parameters = [], []
+        if name is not None:
+            conditions.append("runs.name = ?")
+            parameters.append(name)
+        if arm is not None:
+            conditions.append("runs.arm = ?")
+            parameters.append(arm)
+        if executable is not None:
+            conditions.append("executables.path GLOB ?")
+            parameters.append(executable)
+        if since is not None:
+            conditions.append("runs.started_at >= ?")
+            parameters.append(since)
+        if not include_incomplete:
+            conditions.append("runs.completed_at IS NOT NULL")
+        query = ("SELECT runs.id, runs.name, runs.arm, executables.path, runs.started_at, runs.completed_at, "
+                 "(SELECT COUNT(*) FROM samples WHERE samples.run_id = runs.id) "
+                 "FROM runs LEFT JOIN executables ON executables.id = runs.executable_id")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY runs.started_at DESC, runs.arm DESC"
+        if last is not None:
+            query += " LIMIT ?"
+            parameters.append(last)
+        with self.lock:
+            rows = self.connection.execute(query, parameters).fetchall()
+        return [{"id": row[0], "name": row[1], "arm": row[2], "executable": row[3], "started_at": row[4],
+                 "completed_at": row[5], "samples": row[6]} for row in reversed(rows)]
+
+    def samples(self, run_ids, path_pattern="*", metric="total", phase=None):
+        """Return {run id: {path: values in iteration order}} for the tests whose path matches the glob pattern."""
+        placeholders = ",".join("?" * len(run_ids))
+        query = ("SELECT samples.run_id, tests.parts, samples.value FROM samples "
+                 "JOIN tests ON tests.id = samples.test_id "
+                 f"WHERE samples.run_id IN ({placeholders}) AND tests.path GLOB ? AND samples.metric = ?")
+        parameters = [*run_ids, path_pattern, metric]
+        if phase is not None:
+            query += " AND samples.phase = ?"
+            parameters.append(phase)
+        query += " ORDER BY samples.run_id, tests.path, samples.iteration"
+        results = {run_id: {} for run_id in run_ids}
+        with self.lock:
+            for run_id, parts, value in self.connection.execute(query, parameters):
+                results[run_id].setdefault(tuple(json.loads(parts)), []).append(value)
+        return results
+
+    def load_run(self, name=None):
+        """Read a run into the same structure as a JSON results file; the most recent complete run by default."""
+        if name is None:
+            latest = self.runs(last=1)
+            if not latest:
+                raise ValueError("The database contains no complete runs")
+            name = latest[0]["name"]
+        runs = self.runs(name=name, include_incomplete=True)
+        if not runs:
+            raise ValueError(f"No run named '{name}' in the database")
+
+        def build(run_id, phase=None):
+            data = {"test_results": {}, "benchmark_totals": {}, "measurements": {"paths": [], "values": []}}
+            for metric, key in (("total", "totalTime"), ("score", "score")):
+                for path, values in self.samples([run_id], metric=metric, phase=phase)[run_id].items():
+                    if len(path) == 1:
+                        data["benchmark_totals"].setdefault(path[0], {})[key] = values
+                        continue
+                    data["measurements"]["paths"].append(list(path))
+                    data["measurements"]["values"].append(values)
+                    if len(path) == 3:
+                        data["test_results"].setdefault(path[0], {}).setdefault(path[1], {})[path[2]] = values
+            return data
+
+        arms = {}
+        for run in runs:
+            data = build(run["id"])
+            data["phases"] = {phase: build(run["id"], phase) for phase in ("cold", "warm")}
+            if run["executable"]:
+                data["executable"] = run["executable"]
+            arms[run["arm"]] = data
+        if len(arms) == 1:
+            return next(iter(arms.values()))
+        return {"arms": arms}
+
+
+def split_database_source(source):
+    """Split "<database>:<run name>" into its parts, or return None if source does not name a results database."""
+    for suffix in DATABASE_SUFFIXES:
+        database, separator, run_name = source.partition(suffix + ":")
+        if separator:
+            return database + suffix, run_name or None
+        if source.endswith(suffix):
+            return source, None
+    return None
+
+
+def load_database_results(source):
+    database_path, run_name = split_database_source(source)
+    if not os.path.isfile(database_path):
+        raise FileNotFoundError(f"No results database '{database_path}'")
+    database = ResultsDatabase(database_path)
+    try:
+        return database.load_run(run_name)
+    finally:
+        database.close()
+
+
+def results_file_arms(data):
+    if "arms" in data:
+        return data["arms"]
+    return {"A": data}
+
+
+def normalized_results(data):
+    """Convert an arm of a results file, in any of the formats run.py has written, to the form add_results takes."""
+    if "measurements" in data:
+        measurements = {tuple(path): values for path, values in zip(data["measurements"]["paths"], data["measurements"]["values"])}
+    else:
+        # Older results files only contain the benchmark/suite/test level.
+        measurements = {}
+        for benchmark, suites in data.get("test_results", {}).items():
+            for suite, tests in suites.items():
+                for test, values in tests.items():
+                    if values and isinstance(values[0], list):
+                        values = [value for run in values for value in run]
+                    measurements[(benchmark, suite, test)] = values
+    return {"benchmark_totals": data.get("benchmark_totals", {}), "measurements": measurements,
+            "iteration_phases": data.get("iteration_phases", {})}
+
+
+def ingest(database, results_path, name=None, executable=None, replace=False):
+    """Add a results file written by run.py to the database, returning the number of samples added."""
+    if results_path.endswith(".npz"):
+        data = load_results(results_path)
+    else:
+        with open(results_path) as f:
+            data = json.load(f)
+    start_times = [job["start_time"] for job in data.get("jobs", []) if "start_time" in job]
+    started_at = min(start_times) if start_times else os.path.getmtime(results_path)
+    name = name or Path(results_path).stem
+    # Results files record each arm's executable in their metadata; older A/B files also record it in the arm.
+    recorded_executables = data.get("metadata", {}).get("executables", {})
+    samples = 0
+    for arm, arm_data in results_file_arms(data).items():
+        arm_executable = arm_data.get("executable") or recorded_executables.get(arm, {}).get("path") or executable
+        run_id = database.begin_run(name, arm, arm_executable, started_at,
+                                    source=os.path.abspath(results_path), replace=replace)
+        results = normalized_results(arm_data)
+        database.add_results(run_id, results)
+        database.complete_run(run_id, os.path.getmtime(results_path))
+        samples += sum(len(values) for values in results["measurements"].values())
+        samples += sum(len(values) for totals in results["benchmark_totals"].values() for values in totals.values())
+    return samples
+
+
+def format_time(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M") if timestamp else "—"
+
+
+def parse_since(value):
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Store run.py results in an SQLite database and query them.")
+    parser.add_argument("--db", default="results.db", help="Results database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="Add results files (.json, or .npz from run.py --npz)")
+    ingest_parser.add_argument("files", nargs="+")
+    ingest_parser.add_argument("--name", help="Run name (default: the file name without its extension)")
+    ingest_parser.add_argument("--executable", help="Executable to record for results files that do not name one")
+    ingest_parser.add_argument("--replace", action="store_true", help="Replace runs of the same name")
+
+    def add_filters(filter_parser):
+        filter_parser.add_argument("--arm", help="Only runs of this arm, e.g. A or B")
+        filter_parser.add_argument("--executable", help="Only runs of executables matching this glob pattern")
+        filter_parser.add_argument("--since", type=parse_since, help="Only runs started on or after this date (YYYY-MM-DD)")
+        filter_parser.add_argument("--last", type=int, help="Only the most recent N runs")
+        filter_parser.add_argument("--include-incomplete", action="store_true",
+                                   help="Include runs that were interrupted while streaming into the database")
+
+    runs_parser = subparsers.add_parser("runs", help="List the runs in the database")
+    add_filters(runs_parser)
+
+    trend_parser = subparsers.add_parser("trend", help="Show how tests changed over a series of runs")
+    trend_parser.add_argument("path", nargs="?", default="*",
+                              help="Glob pattern of test paths, e.g. 'Speedometer3' or 'Speedometer3/TodoMVC-*/*'")
+    trend_parser.add_argument("--metric", choices=["total", "score"], default="total")
+    trend_parser.add_argument("--phase", choices=["cold", "warm"], help="Only cold or only warm iterations")
+    add_filters(trend_parser)
+
+    export_parser = subparsers.add_parser("export", help="Write a run as a JSON results file")
+    export_parser.add_argument("name", nargs="?", help="Run name (default: the most recent complete run)")
+    export_parser.add_argument("--output", "-o", required=True)
+
+    args = parser.parse_args()
+
+    if args.command != "ingest" and not os.path.isfile(args.db):
+        print(f"Error: No results database '{args.db}'.", file=sys.stderr)
+        sys.exit(1)
+    database = ResultsDatabase(args.db)
+
+    if args.command == "ingest":
+        for results_path in args.files:
+            try:
+                samples = ingest(database, results_path, args.name, args.executable, args.replace)
+            except ValueError as e:
+                print(f"Error: {results_path}: {e}; use --replace to overwrite it.", file=sys.stderr)
+                sys.exit(1)
+            print(f"{results_path}: added {samples} samples")
+        return
+
+    if args.command == "export":
+        try:
+            data = database.load_run(args.name)
+        except ValueError as e:
+            print(f"Error: {e}.", file=sys.stderr)
+            sys.exit(1)
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=4)
+        return
+
+    runs = database.runs(arm=args.arm, executable=args.executable, since=args.since,
+                         include_incomplete=args.include_incomplete, last=args.last)
+
+    if args.command == "runs":
+        print(tabulate([[run["name"], run["arm"], run["executable"] or "—", format_time(run["started_at"]),
+                         format_time(run["completed_at"]), run["samples"]] for run in runs],
+                       headers=["Run", "Arm", "Executable", "Started", "Completed", "Samples"]))
+        return
+
+    samples = database.samples([run["id"] for run in runs], args.path, args.metric, args.phase) if runs else {}
+    paths = sorted({path for run_samples in samples.values() for path in run_samples})
+    table = []
+    for path in paths:
+        baseline = None
+        for run in runs:
+            values = samples[run["id"]].get(path)
+            if not values:
+                continue
+            mean = sum(values) / len(values)
+            if baseline is None:
+                baseline = mean
+            table.append(["/".join(path), run["name"], run["arm"], format_time(run["started_at"]), len(values),
+                          format_mean_confidence_interval(values), f"{mean / baseline:.3f}"])
+    if not table:
+        print(f"No samples of tests matching '{args.path}' in the selected runs.", file=sys.stderr)
+        sys.exit(1)
+    print(tabulate(table, headers=["Path", "Run", "Arm", "Started", "Iterations", "Mean ± Range", "Relative to First"]))
+
+
+if __name__ == "__main__":
+    main()
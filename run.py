@@ -1,7 +1,21 @@
 #!/usr/bin/env python3
 import argparse
+import array
+import datetime
+import email.utils
+import hashlib
+import io
 import json
+import math
+import mimetypes
+import mmap
+import platform
+import secrets
 import os
+import posixpath
+import queue
+import random
+import re
 import subprocess
 import sys
 import signal
@@ -10,35 +24,225 @@ import statistics
 
 import threading
 import time
+import urllib.error
+import urllib.request
 
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer, SimpleHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from tabulate import tabulate
-from urllib.parse import urlunparse, urlencode
+from types import MappingProxyType
+from urllib.parse import unquote, urlsplit, urlunparse, urlencode
 
 test_results = {}
 benchmark_totals = {}
-def append_table_data(benchmark, results):
-    def append_tests_recursively(benchmark, json_object, suite=None, test=None):
-        if isinstance(json_object, dict):
-            if "total" in json_object and isinstance(json_object["total"], (int, float)):
-                if suite and test:
-                    if benchmark not in test_results:
-                        test_results[benchmark] = {}
-                    if suite not in test_results[benchmark]:
-                        test_results[benchmark][suite] = {}
-                    if test not in test_results[benchmark][suite]:
-                        test_results[benchmark][suite][test] = []
-                    test_results[benchmark][suite][test].append(json_object["total"])
-
-            if "tests" in json_object and isinstance(json_object["tests"], dict):
-                for key, value in json_object["tests"].items():
-                    if suite:
-                        append_tests_recursively(benchmark, value, suite, key)
-                    else:
-                        append_tests_recursively(benchmark, value, key)
-
-    append_tests_recursively(benchmark, results)
+server_stats = {}
+request_timelines = {}
+job_records = []
+adaptive_results = {}
+failures = []
+environment_samples = []
+# Host and executable metadata sent by each run.py --worker, keyed by worker.
+worker_metadata = {}
+journal = None
+# While running a shard as a run.py --worker, the iterations it produces, to be sent back to the coordinator.
+shard_iterations = None
+# Ladybird processes that are running, so they can be killed if the harness is interrupted. Ladybird runs in its own
+# session, so it does not receive the terminal's Ctrl-C itself.
+running_processes = set()
+running_processes_lock = threading.Lock()
+# With --results-db, every iteration is also streamed into a results database, as a run per arm.
+results_db = None
+results_db_runs = {}
+# With --event-log, every POST from the benchmark pages is written to a Journal as it arrives, and with --stream-only
+# iteration results are not kept in memory at all.
+event_log = None
+keep_results = True
+# Benchmarks run with --split-suites: the suites each iteration is made up of, and the score of a geomean of their totals.
+split_benchmarks = {}
+# Per-suite iteration records of split benchmarks, per (arm, benchmark), waiting for the other suites' same iteration.
+unmerged_suite_iterations = {}
+# Results of each build being measured. Without --executable-b, everything is recorded for arm "A".
+arm_results = {"A": {"test_results": test_results, "benchmark_totals": benchmark_totals}}
+results_lock = threading.Lock()
+def record_iteration(record):
+    """Record the results of one iteration, as sent to /IterationComplete; called with results_lock held."""
+    # Suite iterations of benchmarks run with --split-suites are merged back into iterations of the whole benchmark.
+    # A worker sends the unmerged records of its shards to the coordinator, which merges them itself.
+    if record.get("suite") and record["benchmark"] in split_benchmarks:
+        append_suite_iteration(record)
+    else:
+        append_table_data(record["benchmark"], record["results"], record["arm"], record["phase"])
+
+
+def append_suite_iteration(record):
+    """Collect one suite's iteration of a split benchmark, merging complete iterations back into one.
+
+    Each suite runs in its own Ladybird process, so its iterations arrive independently. Once every suite has reported
+    its n-th iteration, those are merged into the n-th iteration of the benchmark, with the total and score computed
+    the way the benchmark itself does.
+    """
+    benchmark = record["benchmark"]
+    suites = split_benchmarks[benchmark]["suites"]
+    pending = unmerged_suite_iterations.setdefault((record["arm"], benchmark), {suite: [] for suite in suites})
+    pending[record["suite"]].append(record)
+    while all(pending.values()):
+        parts = [pending[suite].pop(0) for suite in suites]
+        tests = {}
+        for part in parts:
+            tests.update(part["results"]["tests"])
+        suite_totals = [suite_results["total"] for suite_results in tests.values()]
+        geomean = statistics.geometric_mean(suite_totals)
+        results = {
+            "tests": tests,
+            "total": math.fsum(suite_totals),
+            "mean": statistics.mean(suite_totals),
+            "geomean": geomean,
+            "score": split_benchmarks[benchmark]["geomean_score"] / geomean,
+        }
+        # A merged iteration is only cold if every suite's part of it was.
+        phase = "cold" if all(part["phase"] == "cold" for part in parts) else "warm"
+        append_table_data(benchmark, results, record["arm"], phase)
+
+
+def append_unmerged_suite_iterations():
+    """Keep the test results of suite iterations that could not be merged, for example because another suite crashed."""
+    for (arm, benchmark), pending in unmerged_suite_iterations.items():
+        missing_suites = [suite for suite, records in pending.items() if not records]
+        records = [record for suite_records in pending.values() for record in suite_records]
+        if records:
+            print(f"Warning: {len(records)} suite iterations of {benchmark} could not be merged because "
+                  f"{', '.join(missing_suites)} did not complete as many iterations; only their test results are recorded",
+                  file=sys.stderr)
+        for record in records:
+            append_results(arm_results[arm], benchmark, record["results"], include_totals=False)
+        for suite_records in pending.values():
+            suite_records.clear()
+
+
+def export_results(results):
+    """Convert recorded results to their JSON form, with measurements stored as parallel "paths" and "values" arrays."""
+    exported = dict(results)
+    measurements = results.get("measurements", {})
+    exported["measurements"] = {"paths": [list(path) for path in measurements],
+                                "values": list(measurements.values())}
+    if "phases" in results:
+        exported["phases"] = {phase: export_results(phase_results) for phase, phase_results in results["phases"].items()}
+    return exported
+
+
+NPZ_METRICS = ["total", "score"]
+NPZ_PHASES = ["cold", "warm"]
+
+
+def write_npz(npz_path, arms, run_id):
+    """Write the results of every arm as one flat table of values, in NumPy's .npz format.
+
+    Each value has a row in the "values", "path_index", "iteration", "arm_index", "metric_index", "phase_index" and
+    "run_index" columns. The index columns point into string tables: "paths" (one row per path, padded with empty
+    strings), "arms", "metrics", "phases" and "run_ids". A benchmark's own total time and score are stored under the
+    one-element path of the benchmark.
+    """
+    # NumPy is only needed for --npz.
+    import numpy as np
+
+    paths = {}
+    columns = {name: [] for name in ("values", "path_index", "iteration", "arm_index", "metric_index", "phase_index")}
+
+    def add_values(arm_index, path, metric, values, iteration_phases):
+        path_index = paths.setdefault(path, len(paths))
+        for iteration, value in enumerate(values):
+            phase = iteration_phases[iteration] if iteration < len(iteration_phases) else None
+            columns["values"].append(value)
+            columns["path_index"].append(path_index)
+            columns["iteration"].append(iteration)
+            columns["arm_index"].append(arm_index)
+            columns["metric_index"].append(NPZ_METRICS.index(metric))
+            columns["phase_index"].append(NPZ_PHASES.index(phase) if phase else -1)
+
+    arm_names = list(arms)
+    for arm_index, arm in enumerate(arm_names):
+        results = arms[arm]
+        iteration_phases = results.get("iteration_phases", {})
+        for benchmark, totals in results["benchmark_totals"].items():
+            add_values(arm_index, (benchmark,), "total", totals["totalTime"], iteration_phases.get(benchmark, []))
+            add_values(arm_index, (benchmark,), "score", totals.get("score", []), iteration_phases.get(benchmark, []))
+        for path, values in results.get("measurements", {}).items():
+            add_values(arm_index, path, "total", values, iteration_phases.get(path[0], []))
+
+    depth = max((len(path) for path in paths), default=1)
+    np.savez_compressed(
+        npz_path,
+        paths=np.array([list(path) + [""] * (depth - len(path)) for path in paths], dtype=str).reshape(len(paths), depth),
+        arms=np.array(arm_names, dtype=str),
+        metrics=np.array(NPZ_METRICS, dtype=str),
+        phases=np.array(NPZ_PHASES, dtype=str),
+        run_ids=np.array([run_id], dtype=str),
+        values=np.array(columns["values"], dtype=np.float64),
+        path_index=np.array(columns["path_index"], dtype=np.int32),
+        iteration=np.array(columns["iteration"], dtype=np.int32),
+        arm_index=np.array(columns["arm_index"], dtype=np.int8),
+        metric_index=np.array(columns["metric_index"], dtype=np.int8),
+        phase_index=np.array(columns["phase_index"], dtype=np.int8),
+        run_index=np.zeros(len(columns["values"]), dtype=np.int32),
+    )
+
+
+def append_table_data(benchmark, results, arm="A", phase=None):
+    """Record one iteration's results for arm, and separately under its phase: "cold" for the first iteration run by
+    a Ladybird process, "warm" for the rest."""
+    if results_db is not None:
+        iteration = {"test_results": {}, "benchmark_totals": {}, "iteration_phases": {benchmark: [phase]}}
+        append_results(iteration, benchmark, results)
+        results_db.add_results(results_db_runs[arm], iteration)
+    if not keep_results:
+        return
+    if arm not in arm_results:
+        arm_results[arm] = {"test_results": {}, "benchmark_totals": {}}
+    append_results(arm_results[arm], benchmark, results)
+    arm_results[arm].setdefault("iteration_phases", {}).setdefault(benchmark, []).append(phase)
+    if phase:
+        phases = arm_results[arm].setdefault("phases", {})
+        append_results(phases.setdefault(phase, {"test_results": {}, "benchmark_totals": {}}), benchmark, results)
+
+
+def append_results(destination, benchmark, results, include_totals=True):
+    """Append every numeric total below results, including each test's Sync and Async step times, to destination.
+
+    destination["measurements"] maps the full path of each total, such as (benchmark, suite, test, "Sync"), to its
+    values, one per iteration. destination["test_results"] is the benchmark/suite/test view of the same data that
+    older results files contain, and destination["benchmark_totals"] holds each iteration's total and score.
+    """
+    measurements = destination.setdefault("measurements", {})
+    test_results = destination["test_results"]
+    benchmark_totals = destination["benchmark_totals"]
+
+    def append_tests_recursively(path, json_object):
+        tests = json_object.get("tests")
+        if not isinstance(tests, dict):
+            return
+        for key, value in tests.items():
+            child_path = path + (key,)
+            # Speedometer reports each test's steps as bare numbers: {"tests": {"Sync": ..., "Async": ...}, "total": ...}.
+            if isinstance(value, (int, float)):
+                total = value
+            elif isinstance(value, dict):
+                total = value.get("total")
+            else:
+                continue
+            if isinstance(total, (int, float)):
+                measurements.setdefault(child_path, []).append(total)
+                if len(child_path) == 3:
+                    benchmark, suite, test = child_path
+                    test_results.setdefault(benchmark, {}).setdefault(suite, {}).setdefault(test, []).append(total)
+            if isinstance(value, dict):
+                append_tests_recursively(child_path, value)
+
+    append_tests_recursively((benchmark,), results)
+    if not include_totals:
+        return
 
     if benchmark not in benchmark_totals:
         benchmark_totals[benchmark] = {}
@@ -47,48 +251,751 @@ def append_table_data(benchmark, results):
         benchmark_totals[benchmark]["totalTime"] = []
     benchmark_totals[benchmark]["totalTime"].append(results["total"])
 
+    # Startup measurements have no score.
+    if "score" not in results:
+        return
     if "score" not in benchmark_totals[benchmark]:
         benchmark_totals[benchmark]["score"] = []
     benchmark_totals[benchmark]["score"].append(results["score"])
 
+@dataclass(frozen=True)
+class CachedAsset:
+    body: bytes | memoryview
+    content_type: str
+    last_modified: float
+    encoded_bodies: dict = field(default_factory=dict)
+    # Strong validators for each representation, keyed by content encoding ("identity" for the plain body).
+    etags: dict = field(default_factory=dict)
+
+
+# Precompressed variants, as written by precompress.py, live next to the file they encode.
+CONTENT_ENCODING_SUFFIXES = {
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+# A packed benchmark is PACK_MAGIC, the byte length of a JSON index as an 8-byte little-endian integer, the index
+# itself and then the uncompressed file data. Offsets in the index are relative to the start of the file data.
+PACK_MAGIC = b"LBPACK1\n"
+PACK_INDEX_LENGTH_SIZE = 8
+
+CACHE_CONTROL_POLICIES = {
+    "none": None,
+    "no-store": "no-store",
+    "revalidate": "no-cache",
+    "immutable": "public, max-age=31536000, immutable",
+}
+
+
+# Emulated network conditions for asset requests. Latency is added before each response, varied uniformly by up to
+# the jitter either way, and download bandwidth is enforced on every connection. Values follow the WebPageTest and
+# Chrome DevTools presets of the same names.
+NETWORK_PROFILES = {
+    "loopback": {"latency_ms": 0, "jitter_ms": 0, "download_kbps": None},
+    "cable": {"latency_ms": 28, "jitter_ms": 2, "download_kbps": 5000},
+    "dsl": {"latency_ms": 50, "jitter_ms": 5, "download_kbps": 1500},
+    "4g": {"latency_ms": 170, "jitter_ms": 15, "download_kbps": 9000},
+    "fast-3g": {"latency_ms": 562.5, "jitter_ms": 40, "download_kbps": 1440},
+    "slow-3g": {"latency_ms": 2000, "jitter_ms": 100, "download_kbps": 400},
+}
+
+
+def guess_content_type(path):
+    _, ext = posixpath.splitext(path)
+    extensions_map = SimpleHTTPRequestHandler.extensions_map
+    if ext in extensions_map:
+        return extensions_map[ext]
+    if ext.lower() in extensions_map:
+        return extensions_map[ext.lower()]
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or "application/octet-stream"
+
+
+def etag_for_digest(digest):
+    return f'"{digest.hexdigest()}"'
+
+
+def content_etag(data):
+    return etag_for_digest(hashlib.blake2b(data, digest_size=16))
+
+
+def is_precompressed_variant(file_name, file_name_set):
+    return any(file_name.endswith(suffix) and file_name.removesuffix(suffix) in file_name_set
+               for suffix in CONTENT_ENCODING_SUFFIXES.values())
+
+
+def load_asset_cache(root):
+    """Read every file below root into an immutable map keyed by URL path.
+
+    Directories containing an index page are also mapped, with a trailing
+    slash, to that page so "/" and "/dir/" resolve like they do on disk.
+    Precompressed siblings are attached to the asset they encode rather
+    than being served under their own names.
+    """
+    assets = {}
+    for dir_path, _, file_names in os.walk(root):
+        url_dir = "/" + Path(dir_path).relative_to(root).as_posix()
+        url_dir = "/" if url_dir == "/." else url_dir + "/"
+        file_name_set = set(file_names)
+        for file_name in file_names:
+            if is_precompressed_variant(file_name, file_name_set):
+                continue
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, "rb") as f:
+                body = f.read()
+                last_modified = os.fstat(f.fileno()).st_mtime
+            encoded_bodies = {}
+            for encoding, suffix in CONTENT_ENCODING_SUFFIXES.items():
+                if file_name + suffix in file_name_set:
+                    with open(file_path + suffix, "rb") as f:
+                        encoded_bodies[encoding] = f.read()
+            etags = {"identity": content_etag(body)}
+            etags.update((encoding, content_etag(data)) for encoding, data in encoded_bodies.items())
+            assets[url_dir + file_name] = CachedAsset(body, guess_content_type(file_name), last_modified,
+                                                      MappingProxyType(encoded_bodies), MappingProxyType(etags))
+
+        for index_page in SimpleHTTPRequestHandler.index_pages:
+            if url_dir + index_page in assets:
+                assets[url_dir] = assets[url_dir + index_page]
+                break
+
+    return MappingProxyType(assets)
+
+
+def load_packed_assets(archive_path):
+    """Map a pack written by pack.py into memory and index it like load_asset_cache().
+
+    Asset bodies are memoryview slices of the mapping, so serving them never copies file data.
+    """
+    with open(archive_path, "rb") as f:
+        archive = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if archive[:len(PACK_MAGIC)] != PACK_MAGIC:
+        raise ValueError(f"'{archive_path}' is not a benchmark pack")
+    index_start = len(PACK_MAGIC) + PACK_INDEX_LENGTH_SIZE
+    index_length = int.from_bytes(archive[len(PACK_MAGIC):index_start], "little")
+    index = json.loads(archive[index_start:index_start + index_length])
+    data = memoryview(archive)[index_start + index_length:]
+
+    assets = {}
+    for url_path, entry in index["files"].items():
+        offset, length = entry["offset"], entry["length"]
+        encoded_bodies = {}
+        etags = {"identity": entry["etag"]}
+        for encoding, variant in entry["encodings"].items():
+            encoded_bodies[encoding] = data[variant["offset"]:variant["offset"] + variant["length"]]
+            etags[encoding] = variant["etag"]
+        assets[url_path] = CachedAsset(data[offset:offset + length], entry["content_type"], entry["last_modified"],
+                                       MappingProxyType(encoded_bodies), MappingProxyType(etags))
+    return MappingProxyType(assets)
+
+
+def compute_file_etags(root):
+    """Hash every file below root once, returning an immutable map from root-relative path to ETag."""
+    etags = {}
+    for dir_path, _, file_names in os.walk(root):
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, "rb") as f:
+                digest = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16))
+            etags[os.path.relpath(file_path, root)] = etag_for_digest(digest)
+    return MappingProxyType(etags)
+
+
+class ThrottledWriter:
+    """Wraps a connection's output stream so that it is written no faster than bytes_per_second."""
+
+    chunk_size = 16 * 1024
+
+    def __init__(self, stream, bytes_per_second):
+        self.stream = stream
+        self.bytes_per_second = bytes_per_second
+        self.available_at = time.monotonic()
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        for offset in range(0, len(data), self.chunk_size):
+            chunk = data[offset:offset + self.chunk_size]
+            now = time.monotonic()
+            if self.available_at > now:
+                time.sleep(self.available_at - now)
+            self.stream.write(chunk)
+            self.available_at = max(now, self.available_at) + len(chunk) / self.bytes_per_second
+        return len(data)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class RequestTimeline:
+    """Fixed-capacity ring buffer of per-request server timings.
+
+    Storage is allocated up front so recording a request never allocates more than its path string; once full, the
+    oldest records are overwritten. Each record is attributed to a test by counting /TestComplete boundaries: every
+    request that arrives before a test's /TestComplete, and after the previous one, belongs to that test.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.start_ns = time.perf_counter_ns()
+        self.arrival_ns = array.array("q", bytes(8 * capacity))
+        self.finish_ns = array.array("q", bytes(8 * capacity))
+        self.bytes_sent = array.array("q", bytes(8 * capacity))
+        self.status = array.array("i", bytes(4 * capacity))
+        self.test_index = array.array("i", bytes(4 * capacity))
+        self.method = [None] * capacity
+        self.path = [None] * capacity
+        self.completed_tests = []
+        self.lock = threading.Lock()
+
+    def record(self, arrival_ns, finish_ns, bytes_sent, status, method, path, test_index):
+        with self.lock:
+            slot = self.count % self.capacity
+            self.count += 1
+        self.arrival_ns[slot] = arrival_ns - self.start_ns
+        self.finish_ns[slot] = finish_ns - self.start_ns
+        self.bytes_sent[slot] = bytes_sent
+        self.status[slot] = status
+        self.test_index[slot] = test_index
+        self.method[slot] = method
+        self.path[slot] = path
+
+    def complete_test(self, iteration, test):
+        with self.lock:
+            self.completed_tests.append({"iteration": iteration, "test": test})
+
+    def current_test_index(self):
+        return len(self.completed_tests)
+
+    def export(self):
+        first = max(0, self.count - self.capacity)
+        records = []
+        for position in range(first, self.count):
+            slot = position % self.capacity
+            test_index = self.test_index[slot]
+            test = self.completed_tests[test_index] if test_index < len(self.completed_tests) else None
+            records.append({
+                "arrival_ms": self.arrival_ns[slot] / 1e6,
+                "finish_ms": self.finish_ns[slot] / 1e6,
+                "duration_ms": (self.finish_ns[slot] - self.arrival_ns[slot]) / 1e6,
+                "bytes_sent": self.bytes_sent[slot],
+                "status": self.status[slot],
+                "method": self.method[slot],
+                "path": self.path[slot],
+                "iteration": test["iteration"] if test else None,
+                "test": test["test"] if test else None,
+            })
+        return {
+            "capacity": self.capacity,
+            "dropped": first,
+            "records": records,
+        }
+
+
 class BenchmarkHTTPRequestHandler(SimpleHTTPRequestHandler):
+    def __init__(self, request, client_address, server):
+        super().__init__(request, client_address, server, directory=server.directory)
+
+    def do_GET(self):
+        if urlsplit(self.path).path.lstrip("/") in ("", self.server.runner_url):
+            self.server.startup_milestones.setdefault("FirstPageRequest", time.monotonic())
+        else:
+            self.server.startup_milestones.setdefault("FirstSubresourceRequest", time.monotonic())
+        self.emulate_network_latency()
+        if self.server.asset_cache is None:
+            f = self.send_head()
+            if f:
+                try:
+                    self.send_file_body(f)
+                finally:
+                    f.close()
+            return
+        body = self.send_cached_head()
+        if body is not None:
+            body = memoryview(body)
+            for part_header, start, length in self.response_parts:
+                self.wfile.write(part_header)
+                self.wfile.write(body[start:start + length])
+            self.wfile.write(self.response_trailer)
+
+    def do_HEAD(self):
+        self.emulate_network_latency()
+        if self.server.asset_cache is None:
+            return super().do_HEAD()
+        self.send_cached_head()
+
+    def emulate_network_latency(self):
+        profile = self.server.network_profile
+        if not profile["latency_ms"]:
+            return
+        jitter_ms = self.server.network_random.uniform(-profile["jitter_ms"], profile["jitter_ms"])
+        time.sleep(max(0.0, profile["latency_ms"] + jitter_ms) / 1000)
+
+    def send_cached_head(self):
+        url_path = urlsplit(self.path).path
+        request_path = posixpath.normpath(unquote(url_path))
+        if url_path.endswith("/") and request_path != "/":
+            request_path += "/"
+
+        asset = self.server.asset_cache.get(request_path)
+        if asset is None:
+            if request_path + "/" in self.server.asset_cache:
+                self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+                self.send_header("Location", request_path + "/")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        encoding = None
+        if asset.encoded_bodies and self.server.content_encodings:
+            self.vary_accept_encoding = True
+            encoding = self.negotiate_content_encoding(asset.encoded_bodies)
+
+        etag = asset.etags[encoding or "identity"] if self.server.etags else None
+        if self.is_not_modified(etag, asset.last_modified):
+            self.send_not_modified(etag)
+            return None
+
+        body = asset.encoded_bodies[encoding] if encoding else asset.body
+        if not self.send_asset_headers(asset.content_type, encoding, len(body), asset.last_modified, etag):
+            return None
+        return body
+
+    def send_head(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index_path = None
+            if urlsplit(self.path).path.endswith("/"):
+                index_paths = (os.path.join(path, index_page) for index_page in self.index_pages)
+                index_path = next((index_path for index_path in index_paths if os.path.isfile(index_path)), None)
+            if index_path is None:
+                # Let SimpleHTTPRequestHandler redirect to the trailing-slash URL or list the directory.
+                return super().send_head()
+            path = index_path
+        if path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        encoding = None
+        if self.server.content_encodings:
+            available = [encoding for encoding, suffix in CONTENT_ENCODING_SUFFIXES.items() if os.path.isfile(path + suffix)]
+            if available:
+                self.vary_accept_encoding = True
+                encoding = self.negotiate_content_encoding(available)
+
+        file_path = path + CONTENT_ENCODING_SUFFIXES[encoding] if encoding else path
+        try:
+            f = open(file_path, "rb")
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            fs = os.fstat(f.fileno())
+            etag = None
+            if self.server.file_etags is not None:
+                etag = self.server.file_etags.get(os.path.relpath(file_path, self.directory))
+            if self.is_not_modified(etag, fs.st_mtime):
+                self.send_not_modified(etag)
+                f.close()
+                return None
+
+            if not self.send_asset_headers(self.guess_type(path), encoding, fs.st_size, fs.st_mtime, etag):
+                f.close()
+                return None
+            return f
+        except:
+            f.close()
+            raise
+
+    def send_asset_headers(self, content_type, encoding, size, last_modified, etag):
+        """Send the headers of a full or partial response for a representation of the given size.
+
+        The parts of the representation to send follow in self.response_parts as (part header, start, length)
+        tuples, followed by self.response_trailer. Returns False if there is no body to send because the requested
+        ranges could not be satisfied.
+        """
+        ranges = self.requested_ranges(size, etag, last_modified)
+        if ranges == []:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return False
+
+        self.response_trailer = b""
+        if ranges is None:
+            self.send_response(HTTPStatus.OK)
+            self.response_parts = [(b"", 0, size)]
+            self.send_header("Content-type", content_type)
+            self.send_header("Content-Length", str(size))
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.response_parts = [(b"", start, end - start + 1)]
+            self.send_header("Content-type", content_type)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Length", str(end - start + 1))
+        else:
+            boundary = secrets.token_hex(16)
+            self.response_parts = []
+            for start, end in ranges:
+                part_header = (f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                               f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n")
+                # Every part after the first starts on a new line.
+                if self.response_parts:
+                    part_header = "\r\n" + part_header
+                self.response_parts.append((part_header.encode("latin-1"), start, end - start + 1))
+            self.response_trailer = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            content_length = sum(len(part_header) + length for part_header, _, length in self.response_parts)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-type", f"multipart/byteranges; boundary={boundary}")
+            self.send_header("Content-Length", str(content_length + len(self.response_trailer)))
+
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Last-Modified", self.date_time_string(last_modified))
+        self.send_validator_headers(etag)
+        self.end_headers()
+        return True
+
+    def requested_ranges(self, size, etag, last_modified):
+        """Parse the Range header against a representation of the given size, as described in RFC 7233.
+
+        Returns None when the whole representation should be sent, an empty list when none of the requested ranges
+        can be satisfied, or a list of inclusive (start, end) byte positions.
+        """
+        if self.command != "GET" or "Range" not in self.headers:
+            return None
+        if "If-Range" in self.headers:
+            if_range = self.headers["If-Range"].strip()
+            if if_range.startswith('"') or if_range.startswith("W/"):
+                # If-Range requires the strong comparison function, so weak validators never match.
+                if etag is None or if_range != etag:
+                    return None
+            elif if_range != self.date_time_string(last_modified):
+                return None
+
+        unit, _, range_set = self.headers["Range"].partition("=")
+        if unit.strip().lower() != "bytes":
+            return None
+        ranges = []
+        for range_spec in range_set.split(","):
+            first, dash, last = range_spec.strip().partition("-")
+            if not dash:
+                return None
+            try:
+                if not first:
+                    suffix_length = int(last)
+                    if suffix_length < 0:
+                        return None
+                    if suffix_length == 0:
+                        continue
+                    start, end = max(0, size - suffix_length), size - 1
+                else:
+                    start = int(first)
+                    if last and int(last) < start:
+                        return None
+                    end = min(int(last), size - 1) if last else size - 1
+            except ValueError:
+                return None
+            if start < size:
+                ranges.append((start, end))
+        return ranges
+
+    def send_not_modified(self, etag):
+        self.send_response(HTTPStatus.NOT_MODIFIED)
+        self.send_validator_headers(etag)
+        self.end_headers()
+
+    def send_validator_headers(self, etag):
+        if etag:
+            self.send_header("ETag", etag)
+        if self.server.cache_control:
+            self.send_header("Cache-Control", self.server.cache_control)
+
+    def negotiate_content_encoding(self, available):
+        """Return the first of the server's content encodings that is available and accepted by the client."""
+        accepted = {}
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.partition(";")
+            quality = 1.0
+            for param in params.split(";"):
+                key, _, value = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            accepted[name.strip().lower()] = quality
+
+        for encoding in self.server.content_encodings:
+            if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return None
+
+    def end_headers(self):
+        if self.vary_accept_encoding:
+            self.send_header("Vary", "Accept-Encoding")
+        super().end_headers()
+
+    def send_file_body(self, f):
+        # Whole files, and anything SimpleHTTPRequestHandler produced itself such as directory listings, are copied
+        # in one go.
+        if self.response_parts is None or self.response_parts == [(b"", 0, os.fstat(f.fileno()).st_size)]:
+            self.copyfile(f, self.wfile)
+            return
+
+        # Ranges are copied through Python buffers, since they are usually small and need part headers around them.
+        for part_header, start, length in self.response_parts:
+            self.wfile.write(part_header)
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(length, 64 * 1024))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                length -= len(chunk)
+        self.wfile.write(self.response_trailer)
+
+    def copyfile(self, source, outputfile):
+        # Large files are handed to the kernel with sendfile(), so their bytes never pass through Python buffers.
+        if self.server.sendfile_threshold is not None and outputfile is self.wfile and isinstance(source, io.BufferedReader):
+            remaining = os.fstat(source.fileno()).st_size - source.tell()
+            if remaining >= self.server.sendfile_threshold:
+                self.wfile.flush()
+                self.connection.sendfile(source)
+                return
+        super().copyfile(source, outputfile)
+
+    def is_not_modified(self, etag, last_modified):
+        if "If-None-Match" in self.headers:
+            if etag is None:
+                return False
+            # If-None-Match uses the weak comparison function, so a W/ prefix on either side is ignored.
+            candidates = [candidate.strip() for candidate in self.headers["If-None-Match"].split(",")]
+            return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+        return self.is_not_modified_since(last_modified)
+
+    def is_not_modified_since(self, last_modified):
+        if "If-Modified-Since" not in self.headers or "If-None-Match" in self.headers:
+            return False
+        try:
+            if_modified_since = email.utils.parsedate_to_datetime(self.headers["If-Modified-Since"])
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if if_modified_since.tzinfo is None:
+            if_modified_since = if_modified_since.replace(tzinfo=datetime.timezone.utc)
+        if if_modified_since.tzinfo is not datetime.timezone.utc:
+            return False
+        last_modified = datetime.datetime.fromtimestamp(last_modified, datetime.timezone.utc)
+        return last_modified.replace(microsecond=0) <= if_modified_since
+
     def do_POST(self):
         if self.path == "/TestComplete":
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
             json_data = json.loads(post_data.decode('utf-8'))
+            log_event(self.server, "TestComplete", json_data)
+            self.server.last_progress = time.monotonic()
+            self.server.last_test = f"{json_data["suite"]}/{json_data["test"]}"
+            self.server.startup_milestones.setdefault("FirstTestComplete", self.server.last_progress)
             print(f"Iteration {self.server.iteration_count}: Completed '{json_data["benchmark"]}/{json_data["suite"]}/{json_data["test"]}'")
+            if self.server.request_timeline:
+                self.server.request_timeline.complete_test(self.server.iteration_count, f"{json_data["suite"]}/{json_data["test"]}")
+            self.send_empty_response()
+            # Startup runs are only interested in how long it takes to reach the first test.
+            if self.server.startup and self.server.running_ladybird_process:
+                self.server.running_ladybird_process.send_signal(signal.SIGINT)
 
         elif self.path == "/IterationComplete":
-            self.server.iteration_count += 1
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            json_data = json.loads(post_data.decode('utf-8'))
-            append_table_data(json_data["benchmark"], json_data["results"])
-            self.send_response(200)
-            self.end_headers()
+            with self.server.pending_iterations:
+                self.server.pending_iteration_count += 1
+            try:
+                content_length = int(self.headers['Content-Length'])
+                post_data = self.rfile.read(content_length)
+                json_data = json.loads(post_data.decode('utf-8'))
+                log_event(self.server, "IterationComplete", json_data)
+                self.server.last_progress = time.monotonic()
+                record = {
+                    "benchmark": json_data["benchmark"],
+                    "arm": self.server.arm,
+                    "phase": "cold" if self.server.iteration_count == 1 else "warm",
+                    "results": json_data["results"],
+                }
+                if self.server.suite:
+                    record["suite"] = self.server.suite
+                # Startup runs record their own measurement, not the page's.
+                if not self.server.startup:
+                    with results_lock:
+                        self.server.iteration_count += 1
+                        record_iteration(record)
+                        journal_iteration(record)
+            finally:
+                with self.server.pending_iterations:
+                    self.server.pending_iteration_count -= 1
+                    self.server.pending_iterations.notify_all()
+            self.send_empty_response()
 
         elif self.path == "/BenchmarkComplete":
+            post_data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            log_event(self.server, "BenchmarkComplete", json.loads(post_data.decode('utf-8')) if post_data else None)
+
             def run_callback():
+                # A concurrent server may still be reading the final /IterationComplete, which the page sends just
+                # before this request; give it a chance to land before Ladybird is told to exit.
+                with self.server.pending_iterations:
+                    self.server.pending_iterations.wait_for(lambda: self.server.pending_iteration_count == 0, timeout=5)
                 if self.server.running_ladybird_process:
                     self.server.running_ladybird_process.send_signal(signal.SIGINT)
 
-            self.send_response(200)
-            self.end_headers()
+            self.send_empty_response()
             threading.Thread(target=run_callback, daemon=True).start()
             return
         else:
+            # Drain the body so a persistent connection stays usable for the next request.
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
             self.send_error(404, "No such POST endpoint")
 
+    def send_empty_response(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def setup(self):
+        # Idle persistent connections are closed after a while so their threads do not pile up.
+        self.timeout = self.server.keep_alive_timeout
+        self.protocol_version = self.server.protocol_version
+        self.connection_request_count = 0
+        self.vary_accept_encoding = False
+        super().setup()
+        download_kbps = self.server.network_profile["download_kbps"]
+        if download_kbps:
+            self.wfile = ThrottledWriter(self.wfile, download_kbps * 1000 / 8)
+
+    def handle_one_request(self):
+        self.request_arrival_ns = None
+        super().handle_one_request()
+        timeline = self.server.request_timeline
+        if timeline and self.request_arrival_ns is not None:
+            body_bytes = self.response_content_length if self.command != "HEAD" else 0
+            timeline.record(self.request_arrival_ns, time.perf_counter_ns(), self.response_header_bytes + body_bytes,
+                            self.response_status, self.command, self.path, self.request_test_index)
+
+    def parse_request(self):
+        self.request_arrival_ns = time.perf_counter_ns()
+        if self.server.request_timeline:
+            self.request_test_index = self.server.request_timeline.current_test_index()
+        self.response_status = 0
+        self.response_header_bytes = 0
+        self.response_content_length = 0
+        self.response_parts = None
+        self.vary_accept_encoding = False
+        if not super().parse_request():
+            return False
+        self.connection_request_count += 1
+        return True
+
+    def send_response_only(self, code, message=None):
+        self.response_status = code
+        super().send_response_only(code, message)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-length":
+            self.response_content_length = int(value)
+        super().send_header(keyword, value)
+
+    def flush_headers(self):
+        if hasattr(self, "_headers_buffer"):
+            self.response_header_bytes += sum(len(line) for line in self._headers_buffer)
+        super().flush_headers()
+
+    def finish(self):
+        super().finish()
+        if self.connection_request_count == 0:
+            return
+        stats = self.server.stats
+        with self.server.stats_lock:
+            stats["connections"] += 1
+            stats["requests"] += self.connection_request_count
+            if self.connection_request_count > 1:
+                stats["reused_connections"] += 1
+            stats["max_requests_per_connection"] = max(stats["max_requests_per_connection"], self.connection_request_count)
 
     def log_message(self, format, *args):
         pass
 
 
-def start_http_server():
-    server = HTTPServer(('localhost', 0), BenchmarkHTTPRequestHandler)
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that handles each connection on a bounded pool of worker threads."""
+
+    def __init__(self, server_address, handler_class, max_workers):
+        super().__init__(server_address, handler_class)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="BenchmarkHTTPWorker")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def start_http_server(options, directory=None, asset_cache=None, file_etags=None):
+    if options.server == "threaded" and options.http_version == "1.1":
+        # An idle persistent connection holds on to its thread, so with a bounded pool a new connection could wait for
+        # an idle one to time out. Give every connection its own thread instead.
+        server = ThreadingHTTPServer(('localhost', 0), BenchmarkHTTPRequestHandler)
+    elif options.server == "threaded":
+        server = PooledHTTPServer(('localhost', 0), BenchmarkHTTPRequestHandler, options.server_workers)
+    else:
+        server = HTTPServer(('localhost', 0), BenchmarkHTTPRequestHandler)
+    server.directory = directory
+    server.asset_cache = asset_cache
+    server.content_encodings = options.content_encodings
+    server.etags = options.etags
+    server.file_etags = file_etags
+    server.cache_control = CACHE_CONTROL_POLICIES[options.cache_control]
+    server.network_profile = NETWORK_PROFILES[options.network_profile]
+    server.network_random = random.Random()
+    # sendfile() would bypass the throttled output stream.
+    if options.no_sendfile or server.network_profile["download_kbps"]:
+        server.sendfile_threshold = None
+    else:
+        server.sendfile_threshold = options.sendfile_threshold
+    server.protocol_version = f"HTTP/{options.http_version}"
+    server.keep_alive_timeout = 10
+    server.stats = {
+        "connections": 0,
+        "requests": 0,
+        "reused_connections": 0,
+        "max_requests_per_connection": 0,
+    }
+    server.stats_lock = threading.Lock()
+    server.request_timeline = RequestTimeline(options.request_timeline_capacity) if options.request_timeline else None
     server.running_ladybird_process = None
+    server.arm = "A"
     server.iteration_count = 1
+    server.last_progress = time.monotonic()
+    server.last_test = None
+    server.startup = False
+    server.suite = None
+    server.runner_url = ""
+    server.spawn_time = None
+    server.startup_milestones = {}
+    server.pending_iteration_count = 0
+    server.pending_iterations = threading.Condition()
     server.server_thread = threading.Thread(target=server.serve_forever, daemon=True)
     server.server_thread.start()
     for _ in range(50):
@@ -104,10 +1011,93 @@ def start_http_server():
     return server
 
 
-def run_benchmark(benchmark_path, runner_url, benchmark_params, ladybird_arguments):
-    current_dir = os.getcwd()
-    os.chdir(benchmark_path)
-    server = start_http_server()
+class BenchmarkFailure(Exception):
+    def __init__(self, reason, description, completed_iterations, last_test):
+        super().__init__(f"{description} after {completed_iterations} iterations, last completed test: {last_test or 'none'}")
+        self.reason = reason
+        self.completed_iterations = completed_iterations
+        self.last_test = last_test
+
+
+def kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.communicate()
+
+
+def kill_running_processes():
+    """Kill every running Ladybird process group, for when the threads that started them will not get to."""
+    with running_processes_lock:
+        processes = list(running_processes)
+    for process in processes:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def log_event(server, event, payload):
+    """Write a POST from the benchmark page to the event log, timestamped with time.monotonic()."""
+    if event_log is None:
+        return
+    entry = {"event": event, "time": time.monotonic(), "arm": server.arm, "iteration": server.iteration_count,
+             "payload": payload}
+    if server.suite:
+        entry["suite"] = server.suite
+    event_log.append(entry)
+
+
+def journal_iteration(record):
+    """Write an iteration's record to the journal, or keep it for the coordinator when running a shard; called with
+    results_lock held."""
+    if shard_iterations is not None:
+        shard_iterations.append(record)
+    elif journal is not None:
+        journal.append(record)
+
+
+def record_startup(server, benchmark):
+    """Record the time from spawning Ladybird to each startup milestone as one iteration of benchmark."""
+    milestones = server.startup_milestones
+    if "FirstTestComplete" not in milestones:
+        return
+    tests = {name: {"total": (timestamp - server.spawn_time) * 1000} for name, timestamp in milestones.items()}
+    record = {
+        "benchmark": benchmark,
+        "arm": server.arm,
+        "phase": "cold",
+        "results": {"tests": {"Startup": {"tests": tests}}, "total": tests["FirstTestComplete"]["total"]},
+    }
+    with results_lock:
+        record_iteration(record)
+        journal_iteration(record)
+    server.iteration_count += 1
+
+
+def run_benchmark(benchmark, benchmark_path, runner_url, benchmark_params, ladybird_arguments, options, arm="A",
+                  startup=False, suite=None, iterations=None):
+    asset_cache = None
+    if options.serve_from == "memory":
+        asset_cache = load_asset_cache(benchmark_path)
+    elif options.serve_from == "archive":
+        asset_cache = load_packed_assets(benchmark_path)
+    if asset_cache is not None:
+        files = {id(asset): asset for url_path, asset in asset_cache.items() if not url_path.endswith("/")}
+        cache_size = sum(len(asset.body) for asset in files.values())
+        print(f"Serving {len(files)} files ({cache_size / (1024 * 1024):.1f} MiB) from memory, loaded from '{benchmark_path}'")
+
+    file_etags = None
+    if options.etags and asset_cache is None:
+        file_etags = compute_file_etags(benchmark_path)
+
+    directory = benchmark_path if asset_cache is None else None
+    server = start_http_server(options, directory, asset_cache, file_etags)
+    server.arm = arm
+    server.runner_url = runner_url
+    server.startup = startup
+    server.suite = suite
 
     query = urlencode(benchmark_params)
     _, port = server.server_address
@@ -115,77 +1105,787 @@ def run_benchmark(benchmark_path, runner_url, benchmark_params, ladybird_argumen
 
     ladybird_cmd = ladybird_arguments + [url]
 
+    process = None
     try:
+        # Ladybird gets its own process group, so a hung instance can be killed together with its helper processes.
+        server.spawn_time = time.monotonic()
         process = subprocess.Popen(
             ladybird_cmd,
             stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT
+            stderr=subprocess.STDOUT,
+            start_new_session=True
         )
         server.running_ladybird_process = process
+        with running_processes_lock:
+            running_processes.add(process)
+        server.last_progress = time.monotonic()
 
-        process.communicate()
+        while True:
+            try:
+                process.communicate(timeout=1)
+                break
+            except subprocess.TimeoutExpired:
+                if options.hang_timeout and time.monotonic() - server.last_progress > options.hang_timeout:
+                    raise BenchmarkFailure("hang", "No progress", server.iteration_count - 1, server.last_test)
+        if server.startup:
+            record_startup(server, benchmark)
+        if iterations and server.iteration_count - 1 < iterations:
+            raise BenchmarkFailure("crash", f"Ladybird exited with status {process.returncode}",
+                                   server.iteration_count - 1, server.last_test)
 
     except KeyboardInterrupt:
         print("\nInterrupted by user.")
         sys.exit(1)
     finally:
+        if process and process.poll() is None:
+            kill_process_group(process)
+        with running_processes_lock:
+            running_processes.discard(process)
         server.shutdown()
         server.server_close()
         server.server_thread.join(timeout=2)
-        os.chdir(current_dir)
+        # Keyed by benchmark rather than by what is served: Startup serves Speedometer3's files.
+        record_server_stats(benchmark, server.stats)
+        if server.request_timeline:
+            with results_lock:
+                request_timelines.setdefault(benchmark, []).append(server.request_timeline.export())
+    return server.iteration_count - 1
 
 
-def main():
-    available_benchmarks = {
-        "Speedometer2": { "runner_url": "index.html" },
-        "Speedometer3": { "runner_url": "index.html" },
-        "StyleBench": { "runner_url": "index.html" },
+class Journal:
+    """Append-only JSON lines file that survives the harness, Ladybird or the host going down mid-run.
+
+    Every record is flushed to the operating system as soon as it is appended, and fsync()ed to disk at most
+    fsync_interval seconds later, so a burst of records shares a single fsync().
+    """
+
+    def __init__(self, path, fsync_interval, append=False):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        if append:
+            Journal.truncate_partial_record(path)
+        self.file = open(path, "a" if append else "w")
+        self.last_fsync = time.monotonic()
+        self.unsynced = False
+        self.lock = threading.Lock()
+        self.fsync_timer = None
+
+    def append(self, record):
+        with self.lock:
+            self.file.write(json.dumps(record) + "\n")
+            self.file.flush()
+            self.unsynced = True
+            delay = self.last_fsync + self.fsync_interval - time.monotonic()
+            if delay <= 0:
+                self.sync_locked()
+            elif not self.fsync_timer:
+                self.fsync_timer = threading.Timer(delay, self.sync)
+                self.fsync_timer.daemon = True
+                self.fsync_timer.start()
+
+    def sync(self):
+        with self.lock:
+            self.sync_locked()
+
+    def sync_locked(self):
+        if self.fsync_timer:
+            self.fsync_timer.cancel()
+            self.fsync_timer = None
+        if self.unsynced and not self.file.closed:
+            os.fsync(self.file.fileno())
+            self.unsynced = False
+        self.last_fsync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            self.sync_locked()
+            self.file.close()
+
+    @staticmethod
+    def truncate_partial_record(path):
+        """Cut off a partially written last line, left behind by a crash, so appended records start on a line of their own."""
+        try:
+            with open(path, "rb+") as f:
+                data = f.read()
+                end = data.rfind(b"\n") + 1
+                if end < len(data):
+                    f.truncate(end)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def read(path):
+        records = []
+        skipped = 0
+        with open(path) as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A crash can leave a partially written line behind; the records after it are still good.
+                    skipped += 1
+        if skipped:
+            print(f"Warning: Skipped {skipped} partially written records in '{path}'", file=sys.stderr)
+        return records
+
+
+def with_iterations(job, iterations):
+    params = [(key, value) for key, value in job["params"] if key != "iterationCount"]
+    return {**job, "iterations": iterations, "params": params + [("iterationCount", str(iterations))]}
+
+
+def with_suite(job, suite):
+    """Restrict job to a single suite of its benchmark, using the query parameter the benchmark understands."""
+    params = [(key, value) for key, value in job["params"] if key != job["suite_parameter"]]
+    return {**job, "suite": suite, "params": params + [(job["suite_parameter"], suite)]}
+
+
+def without_suite(job):
+    """Undo with_suite(), so job runs every default suite of its benchmark again."""
+    if not job.get("suite"):
+        return job
+    params = [(key, value) for key, value in job["params"] if key != job["suite_parameter"]]
+    return {**job, "suite": None, "params": params}
+
+
+def default_suites(tests_source):
+    """Names of the suites that a Speedometer tests.js or tests.mjs enables by default, in order."""
+    suites = []
+    for definition in tests_source.split("Suites.push(")[1:]:
+        name = re.search(r"^    name: [\"'](.+?)[\"']", definition, re.MULTILINE)
+        if name and not re.search(r"^    disabled: true", definition, re.MULTILINE):
+            suites.append(name.group(1))
+    return suites
+
+
+def read_benchmark_file(benchmark_path, relative_path):
+    if benchmark_path.is_file():
+        return bytes(load_packed_assets(benchmark_path)["/" + relative_path].body).decode()
+    return (benchmark_path / relative_path).read_text()
+
+
+def remaining_jobs(jobs, completed_iterations, keep_finished=False):
+    """Drop the work already recorded in completed_iterations, a count per (arm, benchmark, suite), from jobs.
+
+    Jobs are consumed in order; a partially completed job only runs its missing iterations. With keep_finished,
+    fully completed jobs are kept with zero iterations instead of being dropped.
+    """
+    completed_iterations = dict(completed_iterations)
+    remaining = []
+    for job in jobs:
+        key = (job["arm"], job["benchmark"], job.get("suite"))
+        done = min(completed_iterations.get(key, 0), job["iterations"])
+        completed_iterations[key] = completed_iterations.get(key, 0) - done
+        if done == job["iterations"] and not keep_finished:
+            continue
+        remaining.append(with_iterations(job, job["iterations"] - done) if done else job)
+    return remaining
+
+
+def read_sys_file(path):
+    try:
+        return Path(path).read_text().strip()
+    except OSError:
+        return None
+
+
+def sample_cpu_frequencies():
+    governors = {}
+    current_khz = []
+    for cpu in available_cpus():
+        cpufreq = f"/sys/devices/system/cpu/cpu{cpu}/cpufreq"
+        governor = read_sys_file(f"{cpufreq}/scaling_governor")
+        if governor:
+            governors[governor] = governors.get(governor, 0) + 1
+        frequency = read_sys_file(f"{cpufreq}/scaling_cur_freq")
+        if frequency:
+            current_khz.append(int(frequency))
+    if not governors and not current_khz:
+        return None
+    # Either driver may expose the turbo/boost switch.
+    no_turbo = read_sys_file("/sys/devices/system/cpu/intel_pstate/no_turbo")
+    boost = read_sys_file("/sys/devices/system/cpu/cpufreq/boost")
+    if no_turbo is not None:
+        boost = no_turbo == "0"
+    elif boost is not None:
+        boost = boost == "1"
+    return {
+        "governors": governors,
+        "current_khz": {"min": min(current_khz), "max": max(current_khz)} if current_khz else None,
+        "boost": boost,
     }
 
-    parser = argparse.ArgumentParser(description="Speedometer benchmark runner")
-    parser.add_argument("--executable", type=str, help="Path to Ladybird executable", required=True)
-    parser.add_argument("--benchmarks", type=str, help="Benchmarks to run (comma-separated)", default="all")
-    parser.add_argument("--iterations", type=int, help="Number of iterations to run")
-    parser.add_argument("--show-window", action="store_true", help="Show the browser window during the test run")
-    parser.add_argument("--output", "-o", default="results.json", help="JSON output file name.")
 
-    args = parser.parse_args()
+def sample_pressure():
+    pressure = {}
+    for resource in ("cpu", "memory", "io"):
+        contents = read_sys_file(f"/proc/pressure/{resource}")
+        if contents is None:
+            continue
+        pressure[resource] = {}
+        for line in contents.splitlines():
+            kind, *fields = line.split()
+            pressure[resource][kind] = {key: float(value) for key, value in (field.split("=") for field in fields)
+                                        if key != "total"}
+    return pressure or None
 
-    benchmarks = {}
-    if args.benchmarks == "all":
-        benchmarks = available_benchmarks
+
+def sample_memory():
+    contents = read_sys_file("/proc/meminfo")
+    if contents is None:
+        return None
+    meminfo = {}
+    for line in contents.splitlines():
+        key, value = line.split(":", 1)
+        meminfo[key] = int(value.split()[0]) * 1024
+    return {
+        "total_bytes": meminfo["MemTotal"],
+        "available_bytes": meminfo["MemAvailable"],
+        "swap_used_bytes": meminfo.get("SwapTotal", 0) - meminfo.get("SwapFree", 0),
+    }
+
+
+def run_cpu_calibration(rounds=5, loop_iterations=200_000):
+    """Time a fixed, allocation-free CPU loop a few times; a noisy or throttled CPU shows up as spread or drift."""
+    times_ms = []
+    for _ in range(rounds):
+        start = time.perf_counter_ns()
+        value = 0
+        for i in range(loop_iterations):
+            value = (value * 31 + i) & 0xFFFFFFFF
+        times_ms.append((time.perf_counter_ns() - start) / 1e6)
+    median = statistics.median(times_ms)
+    return {"median_ms": median, "spread": (max(times_ms) - min(times_ms)) / median}
+
+
+def sample_environment():
+    return {
+        "time": time.time(),
+        "load_average": list(os.getloadavg()),
+        "cpufreq": sample_cpu_frequencies(),
+        "pressure": sample_pressure(),
+        "memory": sample_memory(),
+        "calibration": run_cpu_calibration(),
+    }
+
+
+# The host properties that must match for results to be comparable; see host_metadata().
+HOST_FINGERPRINT_KEYS = ("cpu_model", "cpu_count", "memory_bytes", "kernel", "machine")
+
+
+def host_metadata():
+    """Describe the host, including a fingerprint of the properties that affect benchmark results."""
+    cpu_model = None
+    for line in (read_sys_file("/proc/cpuinfo") or "").splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() in ("model name", "Hardware", "Model"):
+            cpu_model = value.strip()
+            break
+    uname = platform.uname()
+    memory = sample_memory()
+    host = {
+        "hostname": socket.gethostname(),
+        "cpu_model": cpu_model or platform.processor() or None,
+        "cpu_count": os.cpu_count(),
+        "available_cpus": len(available_cpus()),
+        "memory_bytes": memory["total_bytes"] if memory else None,
+        "kernel": f"{uname.system} {uname.release}",
+        "kernel_version": uname.version,
+        "machine": uname.machine,
+        "python": platform.python_version(),
+    }
+    fingerprint = json.dumps({key: host[key] for key in HOST_FINGERPRINT_KEYS}, sort_keys=True)
+    host["fingerprint"] = hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+    return host
+
+
+def executable_metadata(executable):
+    """Identify a Ladybird executable by its path, size, modification time, content hash and --version output."""
+    path = Path(executable).resolve()
+    stat = path.stat()
+    with open(path, "rb") as f:
+        sha256 = hashlib.file_digest(f, "sha256").hexdigest()
+    try:
+        completed = subprocess.run([str(path), "--version"], stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                                   timeout=10)
+        version = completed.stdout.strip() if completed.returncode == 0 else None
+    except (OSError, subprocess.TimeoutExpired):
+        version = None
+    return {"path": str(path), "size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256, "version": version or None}
+
+
+def run_metadata(options, executables):
+    return {
+        "host": host_metadata(),
+        "executables": {arm: executable_metadata(executable) for arm, executable in executables.items() if executable},
+        "arguments": {key: str(value) if isinstance(value, Path) else value for key, value in vars(options).items()},
+        "command_line": sys.argv,
+    }
+
+
+def environment_problems(sample, options, baseline=None):
+    """Describe every way in which sample is outside the tolerances set in options."""
+    problems = []
+    cpufreq = sample["cpufreq"]
+    if cpufreq:
+        other_governors = sorted(governor for governor in cpufreq["governors"] if governor != "performance")
+        if other_governors:
+            problems.append(f"CPU frequency governor is {', '.join(other_governors)}, not performance")
+        if cpufreq["boost"]:
+            problems.append("CPU turbo/boost is enabled")
+    if sample["load_average"][0] > options.max_load:
+        problems.append(f"1-minute load average is {sample['load_average'][0]:.2f} (maximum {options.max_load})")
+    for resource, pressure in (sample["pressure"] or {}).items():
+        stalled = pressure.get("some", {}).get("avg10", 0.0)
+        if stalled > options.max_pressure:
+            problems.append(f"{resource} pressure is {stalled:.1f}% (maximum {options.max_pressure}%)")
+    memory = sample["memory"]
+    if memory:
+        if memory["available_bytes"] < options.min_available_memory * memory["total_bytes"]:
+            problems.append(f"only {memory['available_bytes'] / memory['total_bytes']:.0%} of memory is available")
+        if memory["swap_used_bytes"]:
+            problems.append(f"{memory['swap_used_bytes'] / (1024 * 1024):.0f} MiB of swap is in use")
+    calibration = sample["calibration"]
+    if calibration["spread"] > options.calibration_tolerance:
+        problems.append(f"CPU calibration loop times vary by {calibration['spread']:.1%}")
+    if baseline:
+        drift = calibration["median_ms"] / baseline["calibration"]["median_ms"] - 1
+        if abs(drift) > options.calibration_tolerance:
+            problems.append(f"CPU calibration loop is {drift:+.1%} slower than before the first benchmark")
+    return problems
+
+
+def preflight_environment(options):
+    """Check the host before any benchmark runs; returns whether it is within tolerance, or exits with --preflight strict."""
+    sample = sample_environment()
+    sample["problems"] = environment_problems(sample, options)
+    environment_samples.append({"after": None, **sample})
+    for problem in sample["problems"]:
+        print(f"Warning: Noisy benchmark host: {problem}", file=sys.stderr)
+    if sample["problems"] and options.preflight == "strict":
+        print("Error: Refusing to run on a host outside tolerance (see --preflight).", file=sys.stderr)
+        sys.exit(1)
+
+
+def resample_environment(options, benchmark):
+    """Sample the host again after a benchmark, flagging anything that drifted out of tolerance since the pre-flight."""
+    sample = sample_environment()
+    with results_lock:
+        baseline = environment_samples[0] if environment_samples else None
+    sample["problems"] = environment_problems(sample, options, baseline)
+    for problem in sample["problems"]:
+        print(f"Warning: Noisy benchmark host after {benchmark}: {problem}", file=sys.stderr)
+    with results_lock:
+        environment_samples.append({"after": benchmark, **sample})
+
+
+def available_cpus():
+    """Return the CPUs this process may run on; every CPU where the platform has no notion of affinity (macOS)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cpus(worker_count):
+    """Split the CPUs this process may run on into worker_count disjoint, contiguous sets."""
+    cpus = available_cpus()
+    if worker_count > len(cpus):
+        raise ValueError(f"Cannot run {worker_count} workers on {len(cpus)} CPUs")
+    set_size, remainder = divmod(len(cpus), worker_count)
+    cpu_sets = []
+    start = 0
+    for worker in range(worker_count):
+        end = start + set_size + (1 if worker < remainder else 0)
+        cpu_sets.append(cpus[start:end])
+        start = end
+    return cpu_sets
+
+
+def run_job(job, options, worker=0, cpus=None):
+    start_time = time.time()
+    if job["startup"]:
+        # Every startup measurement needs a fresh Ladybird process.
+        for _ in range(job["iterations"]):
+            run_with_retries(with_iterations(job, 1), options)
     else:
-        for benchmark_arg in args.benchmarks.split(","):
-            assert benchmark_arg in available_benchmarks, f"Invalid benchmark argument: {benchmark_arg}"
-            benchmarks[benchmark_arg] = available_benchmarks[benchmark_arg]
+        run_with_retries(job, options)
+    with results_lock:
+        job_records.append({
+            "benchmark": job["benchmark"],
+            "arm": job["arm"],
+            "params": dict(job["params"]),
+            "worker": worker,
+            "cpus": cpus,
+            "start_time": start_time,
+            "duration": time.time() - start_time,
+        })
+    # With --parallel, other workers' benchmarks are still running: the calibration loop would slow down their
+    # servers, and their Ladybirds would show up as load and pressure. Only the pre-flight sample is taken then.
+    if options.preflight != "off" and options.parallel == 1:
+        resample_environment(options, job["benchmark"])
 
-    params = []
-    if args.iterations:
-        params.append(("iterationCount", str(args.iterations)))
 
-    if not Path(args.executable).is_file():
-        print(f"Error: Executable '{args.executable}' not found.", file=sys.stderr)
+def run_with_retries(job, options):
+    """Run job in a new Ladybird process, retrying up to options.retries times if it hangs or exits early.
+
+    Iterations that completed before a failure are kept; a retry only runs the iterations that are still missing.
+    """
+    attempt_job = job
+    name = f"{job['benchmark']}/{job['suite']}" if job.get("suite") else job["benchmark"]
+    for attempt in range(options.retries + 1):
+        try:
+            run_benchmark(attempt_job["benchmark"], attempt_job["path"], attempt_job["runner_url"], attempt_job["params"],
+                          attempt_job["ladybird_arguments"], options, attempt_job["arm"], attempt_job["startup"],
+                          attempt_job.get("suite"), attempt_job["iterations"])
+            break
+        except BenchmarkFailure as failure:
+            retrying = attempt < options.retries
+            print(f"Warning: {name} failed ({failure.reason}): {failure}."
+                  f"{' Retrying.' if retrying else ' Giving up.'}", file=sys.stderr)
+            with results_lock:
+                failures.append({
+                    "benchmark": job["benchmark"],
+                    "suite": job.get("suite"),
+                    "arm": job["arm"],
+                    "reason": failure.reason,
+                    "attempt": attempt + 1,
+                    "completed_iterations": failure.completed_iterations,
+                    "last_test": failure.last_test,
+                    "time": time.time(),
+                    "retried": retrying,
+                })
+            remaining_iterations = attempt_job["iterations"] - failure.completed_iterations
+            if remaining_iterations <= 0:
+                break
+            attempt_job = with_iterations(attempt_job, remaining_iterations)
+
+
+def relative_ci_half_width(values):
+    # compare.py pulls in SciPy, which only --target-ci needs.
+    from compare import confidence_interval
+
+    if len(values) < 2:
+        return math.inf
+    mean = statistics.mean(values)
+    _, high = confidence_interval(values)
+    return float(high - mean) / abs(mean) if mean else math.inf
+
+
+def worst_relative_ci_half_width(benchmark, scope):
+    with results_lock:
+        if scope == "total":
+            samples = [benchmark_totals.get(benchmark, {}).get("totalTime", [])]
+        else:
+            samples = [values for tests in test_results.get(benchmark, {}).values() for values in tests.values()]
+        samples = [list(values) for values in samples]
+    if not samples:
+        return math.inf
+    return max(relative_ci_half_width(values) for values in samples)
+
+
+def run_adaptive_job(job, options, worker=0, cpus=None):
+    """Run a benchmark in batches until its confidence interval is narrow enough or the budget is used up.
+
+    The first batch runs the usual number of iterations; every further Ladybird process adds
+    options.batch_iterations more, until the relative 95% confidence interval half-width of the benchmark's total
+    time (or of every test, depending on options.ci_scope) is at most options.target_ci.
+    """
+    benchmark = job["benchmark"]
+    start_time = time.monotonic()
+    # A resumed run may already have completed the first batch.
+    previous_iterations = None
+    if job["iterations"]:
+        with results_lock:
+            previous_iterations = len(benchmark_totals.get(benchmark, {}).get("totalTime", []))
+        run_job(job, options, worker, cpus)
+    while True:
+        with results_lock:
+            iterations = len(benchmark_totals.get(benchmark, {}).get("totalTime", []))
+        relative_ci = worst_relative_ci_half_width(benchmark, options.ci_scope)
+        converged = relative_ci <= options.target_ci
+        out_of_budget = (iterations >= options.max_iterations
+                         or (options.max_time and time.monotonic() - start_time >= options.max_time))
+        if converged or out_of_budget:
+            break
+        # A batch that completed no iterations, for example because Ladybird keeps crashing, would be repeated forever.
+        if iterations == previous_iterations:
+            print(f"Warning: {benchmark}: the last batch completed no iterations, giving up", file=sys.stderr)
+            break
+        previous_iterations = iterations
+        batch = min(options.batch_iterations, options.max_iterations - iterations)
+        print(f"{benchmark}: relative CI half-width {relative_ci:.2%} after {iterations} iterations, running {batch} more")
+        run_job(with_iterations(job, batch), options, worker, cpus)
+
+    if not converged:
+        print(f"Warning: {benchmark} did not reach a relative CI half-width of {options.target_ci:.2%} "
+              f"within budget ({relative_ci:.2%} after {iterations} iterations)", file=sys.stderr)
+    with results_lock:
+        adaptive_results[benchmark] = {
+            "iterations": iterations,
+            "relative_ci_half_width": relative_ci if math.isfinite(relative_ci) else None,
+            "converged": converged,
+        }
+
+
+def run_jobs(jobs, options):
+    """Run every job, with up to options.parallel Ladybird processes at once.
+
+    Each parallel worker pins itself to its own set of CPUs before starting a job. On Linux, affinity set this way
+    only applies to the calling thread, and is inherited by the Ladybird processes and server threads it starts.
+    """
+    run = run_adaptive_job if options.target_ci else run_job
+    if options.parallel == 1:
+        for job in jobs:
+            run(job, options)
+        return
+
+    pending_jobs = queue.SimpleQueue()
+    for job in jobs:
+        pending_jobs.put(job)
+    errors = []
+
+    def run_worker(worker, cpus):
+        os.sched_setaffinity(0, cpus)
+        while not errors:
+            try:
+                job = pending_jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                run(job, options, worker, cpus)
+            except BaseException as error:
+                errors.append(error)
+
+    workers = [threading.Thread(target=run_worker, args=(worker, cpus), daemon=True)
+               for worker, cpus in enumerate(split_cpus(options.parallel))]
+    for worker in workers:
+        worker.start()
+    try:
+        for worker in workers:
+            while worker.is_alive():
+                worker.join(timeout=0.5)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user.")
+        # The worker threads are daemons that will not run run_benchmark's cleanup, so kill their Ladybirds here.
+        kill_running_processes()
         sys.exit(1)
+    if errors:
+        raise errors[0]
 
-    ladybird_arguments = [
-        args.executable,
-        "--force-new-process"
-    ]
-    if not args.show_window:
-        ladybird_arguments += ["--headless=manual"]
 
-    benchmarks_dir = Path(__file__).parent / "benchmarks"
+def interleave_arms(jobs_a, jobs_b, order, seed):
+    """Pair up the jobs of both arms and interleave them, ABAB... or with each pair in a random order."""
+    rng = random.Random(seed)
+    interleaved = []
+    for job_a, job_b in zip(jobs_a, jobs_b):
+        pair = [job_a, job_b]
+        if order == "random":
+            rng.shuffle(pair)
+        interleaved += pair
+    return interleaved
 
-    for benchmark in benchmarks:
-        if args.benchmarks != "all" and benchmark not in args.benchmarks.split(","):
+
+class ShardCoordinator:
+    """Hands out shards of work to run.py --worker instances and merges the iterations they send back.
+
+    A shard is a number of iterations of one benchmark for one arm, run by a worker in a single Ladybird process. A
+    shard that is not returned within lease_timeout seconds, for example because its worker died, is handed out again;
+    whichever copy is returned first is kept.
+    """
+
+    def __init__(self, shards, lease_timeout):
+        self.pending = list(shards)
+        self.shard_count = len(shards)
+        self.lease_timeout = lease_timeout
+        self.leases = {}
+        self.completed = set()
+        self.condition = threading.Condition()
+
+    def next_shard(self):
+        with self.condition:
+            now = time.monotonic()
+            for shard_id, (shard, deadline) in list(self.leases.items()):
+                if deadline < now:
+                    print(f"Warning: Shard {shard_id} was not returned in time, handing it out again", file=sys.stderr)
+                    del self.leases[shard_id]
+                    self.pending.append(shard)
+            if not self.pending:
+                return None
+            shard = self.pending.pop(0)
+            self.leases[shard["id"]] = (shard, now + self.lease_timeout)
+            return shard
+
+    def complete_shard(self, result):
+        with self.condition:
+            shard_id = result["id"]
+            if shard_id in self.completed:
+                return
+            self.completed.add(shard_id)
+            self.leases.pop(shard_id, None)
+            self.pending = [shard for shard in self.pending if shard["id"] != shard_id]
+            merge_shard_result(result)
+            print(f"Shard {shard_id} completed by {result['host']} ({len(self.completed)}/{self.shard_count})")
+            self.condition.notify_all()
+
+    def is_done(self):
+        with self.condition:
+            return len(self.completed) == self.shard_count
+
+    def wait(self):
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.completed) == self.shard_count)
+
+
+class CoordinatorHTTPRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        coordinator = self.server.coordinator
+        if self.path == "/NextShard":
+            shard = coordinator.next_shard()
+            if shard:
+                response = {"shard": shard}
+            elif coordinator.is_done():
+                response = {"done": True}
+            else:
+                # Every remaining shard is leased to a worker, but one of them may still be handed out again.
+                response = {"wait": 1}
+        elif self.path == "/ShardComplete":
+            coordinator.complete_shard(json.loads(body.decode('utf-8')))
+            response = {}
+        else:
+            self.send_error(404, "No such POST endpoint")
+            return
+        response_body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_shards(jobs, shard_iterations):
+    shards = []
+    for job in jobs:
+        remaining = job["iterations"]
+        while remaining > 0:
+            iterations = min(remaining, shard_iterations or remaining)
+            shards.append({"id": len(shards), "benchmark": job["benchmark"], "suite": job.get("suite"), "arm": job["arm"],
+                           "iterations": iterations})
+            remaining -= iterations
+    return shards
+
+
+def merge_shard_result(result):
+    with results_lock:
+        for record in result["iterations"]:
+            record_iteration(record)
+            journal_iteration(record)
+        job_records.extend({**record, "host": result["host"]} for record in result["jobs"])
+        worker_metadata[result["host"]] = result["metadata"]
+        failures.extend({**failure, "host": result["host"]} for failure in result["failures"])
+        environment_samples.extend({**sample, "host": result["host"]} for sample in result["environment"])
+    for benchmark, stats in result["server_stats"].items():
+        merge_server_stats(benchmark, stats)
+
+
+def run_coordinator(jobs, options):
+    host, _, port = options.coordinator.rpartition(":")
+    coordinator = ShardCoordinator(make_shards(jobs, options.shard_iterations), options.shard_timeout)
+    server = ThreadingHTTPServer((host or "localhost", int(port)), CoordinatorHTTPRequestHandler)
+    server.daemon_threads = True
+    server.coordinator = coordinator
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Coordinator waiting for workers on http://{host or 'localhost'}:{port} to run {coordinator.shard_count} shards")
+    try:
+        coordinator.wait()
+        # Give polling workers a moment to learn that there is no more work before the server goes away.
+        time.sleep(2)
+    except KeyboardInterrupt:
+        print("\nInterrupted by user.")
+        sys.exit(1)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def post_to_coordinator(url, message):
+    request = urllib.request.Request(url, data=json.dumps(message).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+def run_worker(jobs, options):
+    """Run shards handed out by a run.py --coordinator until it has no work left.
+
+    Shards name a benchmark and arm; everything else, like the Ladybird executable and server options, comes from
+    this worker's own command line. The iterations a shard produces are sent back instead of being journaled.
+    """
+    global shard_iterations
+    coordinator_url = options.worker.rstrip("/")
+    host = f"{socket.gethostname()}:{os.getpid()}"
+    metadata = run_metadata(options, {job["arm"]: job["ladybird_arguments"][0] for job in jobs})
+    # Host samples are kept for the drift checks, and each one is sent along with the first shard result after it.
+    environment_sent = 0
+    # The shard decides which suites run, whatever this worker's own --split-suites says.
+    jobs_by_key = {}
+    for job in jobs:
+        jobs_by_key.setdefault((job["arm"], job["benchmark"]), without_suite(job))
+
+    connect_deadline = time.monotonic() + 60
+    while True:
+        try:
+            response = post_to_coordinator(f"{coordinator_url}/NextShard", {"host": host})
+        except urllib.error.URLError as error:
+            # The coordinator may not be up yet, or may have finished and gone away.
+            if time.monotonic() < connect_deadline:
+                time.sleep(1)
+                continue
+            print(f"Lost connection to coordinator: {error.reason}")
+            return
+        connect_deadline = 0
+        if response.get("done"):
+            return
+        if "wait" in response:
+            time.sleep(response["wait"])
             continue
-        runner_url = available_benchmarks[benchmark]["runner_url"]
-        benchmark_path = benchmarks_dir / benchmark
-        if not benchmark_path.exists():
-            print(f"Benchmark '{benchmark}' not found in benchmarks directory.", file=sys.stderr)
+
+        shard = response["shard"]
+        job = jobs_by_key.get((shard["arm"], shard["benchmark"]))
+        if job is None:
+            print(f"Error: Cannot run shard {shard['id']}: no {shard['benchmark']} benchmark for arm {shard['arm']} "
+                  f"on this worker", file=sys.stderr)
             sys.exit(1)
-        run_benchmark(benchmark_path, runner_url, params, ladybird_arguments)
+        if shard["suite"]:
+            if not job["suite_parameter"]:
+                print(f"Error: Cannot run shard {shard['id']}: {shard['benchmark']} cannot be split into suites", file=sys.stderr)
+                sys.exit(1)
+            job = with_suite(job, shard["suite"])
+        print(f"Running shard {shard['id']}: {shard['iterations']} iterations of {shard['benchmark']} (arm {shard['arm']})")
+        with results_lock:
+            shard_iterations = []
+            job_count, failure_count = len(job_records), len(failures)
+            server_stats.clear()
+        run_job(with_iterations(job, shard["iterations"]), options)
+        with results_lock:
+            result = {
+                "id": shard["id"],
+                "host": host,
+                "iterations": shard_iterations,
+                "jobs": job_records[job_count:],
+                "failures": failures[failure_count:],
+                "server_stats": dict(server_stats),
+                "metadata": metadata,
+                "environment": environment_samples[environment_sent:],
+            }
+            environment_sent = len(environment_samples)
+        post_to_coordinator(f"{coordinator_url}/ShardComplete", result)
 
+
+def print_summary(test_results, benchmark_totals):
     test_times_data = []
     for benchmark, suites in test_results.items():
         for suite, tests in suites.items():
@@ -201,26 +1901,427 @@ def main():
     benchmark_scores_data = []
     for total in benchmark_totals.items():
         benchmark, values = total
-        scores = values["score"]
-        mean_score = statistics.mean(scores)
-        std_dev_score = statistics.stdev(scores) if len(scores) > 1 else 0.0
-        min_score = min(scores)
-        max_score = max(scores)
         times = values["totalTime"]
         mean_time = statistics.mean(times)
         std_dev_time = statistics.stdev(times) if len(times) > 1 else 0.0
         min_time = min(times)
         max_time = max(times)
         test_times_data.append([benchmark, "Total", "", f"{mean_time:.2f} ± {std_dev_time:.2f}", f"{min_time:.2f} … {max_time:.2f}"])
+        if "score" not in values:
+            benchmark_scores_data.append([benchmark, "—", "—", f"{mean_time:.2f} ± {std_dev_time:.2f}", f"{min_time:.2f} … {max_time:.2f}"])
+            continue
+        scores = values["score"]
+        mean_score = statistics.mean(scores)
+        std_dev_score = statistics.stdev(scores) if len(scores) > 1 else 0.0
+        min_score = min(scores)
+        max_score = max(scores)
         benchmark_scores_data.append([benchmark, f"{mean_score:.2f} ± {std_dev_score:.2f}", f"{min_score:.2f} … {max_score:.2f}", f"{mean_time:.2f} ± {std_dev_time:.2f}", f"{min_time:.2f} … {max_time:.2f}"])
     print()
     print(tabulate(benchmark_scores_data, headers=["Benchmark", "Score Mean ± σ", "Score Range", "Time Mean ± σ (ms)", "Time Range (ms)"]))
 
+
+def print_phase_summary(phases):
+    cold_totals = phases.get("cold", {}).get("benchmark_totals", {})
+    warm_totals = phases.get("warm", {}).get("benchmark_totals", {})
+    phase_data = []
+    for benchmark in sorted(cold_totals.keys() | warm_totals.keys()):
+        row = [benchmark]
+        for totals in (cold_totals, warm_totals):
+            times = totals.get(benchmark, {}).get("totalTime", [])
+            row += [f"{statistics.mean(times):.2f}" if times else "—", len(times)]
+        phase_data.append(row)
+    print()
+    print(tabulate(phase_data, headers=["Benchmark", "Cold Time Mean (ms)", "Cold Iterations", "Warm Time Mean (ms)", "Warm Iterations"]))
+
+
+def record_server_stats(benchmark, stats):
+    print(f"{benchmark}: served {stats['requests']} requests over {stats['connections']} connections "
+          f"({stats['reused_connections']} reused)")
+    merge_server_stats(benchmark, stats)
+
+
+def merge_server_stats(benchmark, stats):
+    with results_lock:
+        if benchmark not in server_stats:
+            server_stats[benchmark] = dict.fromkeys(stats, 0)
+        totals = server_stats[benchmark]
+        for key, value in stats.items():
+            if key.startswith("max_"):
+                totals[key] = max(totals[key], value)
+            else:
+                totals[key] += value
+
+
+def main():
+    available_benchmarks = {
+        "Speedometer2": {
+            "runner_url": "index.html", "default_iterations": 10,
+            # How a single suite is selected, where the suites are defined, and the score of a geomean of suite totals.
+            "suite_parameter": "suite", "tests_file": "resources/tests.js", "geomean_score": 60 * 1000 / 3,
+        },
+        "Speedometer3": {
+            "runner_url": "index.html", "default_iterations": 10,
+            "suite_parameter": "suites", "tests_file": "resources/tests.mjs", "geomean_score": 1000,
+        },
+        "StyleBench": { "runner_url": "index.html", "default_iterations": 10 },
+        # Measures the time from starting a fresh Ladybird process until Speedometer3's first test completes.
+        "Startup": { "runner_url": "index.html", "default_iterations": 10, "startup_page": "Speedometer3" },
+    }
+
+    parser = argparse.ArgumentParser(description="Speedometer benchmark runner")
+    parser.add_argument("--executable", type=str, help="Path to Ladybird executable")
+    parser.add_argument("--benchmarks", type=str, help="Benchmarks to run (comma-separated)", default="all")
+    parser.add_argument("--iterations", type=int, help="Number of iterations to run")
+    parser.add_argument("--show-window", action="store_true", help="Show the browser window during the test run")
+    parser.add_argument("--output", "-o", default="results.json", help="JSON output file name.")
+    parser.add_argument("--npz", action="store_true",
+                        help="Also write the results as a compact columnar NumPy file, <output>.npz, which compare.py reads too")
+    parser.add_argument("--results-db", metavar="FILE",
+                        help="Also stream the results of every iteration into this results database (see results_db.py)")
+    parser.add_argument("--run-name",
+                        help="Name of the run in --results-db (default: the output file name and the start time)")
+    parser.add_argument("--event-log", action="store_true",
+                        help="Write every test, iteration and benchmark completion reported by the benchmark pages to "
+                             "<output>.events.jsonl as it arrives")
+    parser.add_argument("--stream-only", action="store_true",
+                        help="Do not keep iteration results in memory; they are only written to the journal, the "
+                             "--event-log and the --results-db, so memory use stays flat during very long runs")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run from its journal (<output>.journal.jsonl), only running the "
+                             "benchmarks and iterations that are missing from it")
+    parser.add_argument("--journal-fsync-interval", type=float, default=1.0,
+                        help="Maximum time, in seconds, between an iteration's results arriving and being fsync()ed to the journal")
+    parser.add_argument("--hang-timeout", type=float, default=300,
+                        help="Kill Ladybird if no test completes for this many seconds (0 to wait forever)")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Number of times to rerun the missing iterations of a benchmark after Ladybird hangs")
+    parser.add_argument("--split-suites", action="store_true",
+                        help="Run each suite of Speedometer2 and Speedometer3 as a separate job in its own Ladybird "
+                             "process, and merge their results back into one benchmark")
+    parser.add_argument("--process-per-iteration", action="store_true",
+                        help="Start a new Ladybird process for every iteration, so every iteration is measured cold")
+    parser.add_argument("--coordinator", metavar="[HOST:]PORT",
+                        help="Instead of running Ladybird, listen on this address and hand out the benchmark work to "
+                             "run.py --worker instances, merging their results into --output")
+    parser.add_argument("--worker", metavar="URL",
+                        help="Run shards of work handed out by the run.py --coordinator at this URL until it is done")
+    parser.add_argument("--shard-iterations", type=int,
+                        help="Split each benchmark's iterations into shards of at most this many iterations "
+                             "(default: one shard per benchmark)")
+    parser.add_argument("--shard-timeout", type=float, default=3600,
+                        help="Hand a shard out again if its worker has not returned it within this many seconds")
+    parser.add_argument("--preflight", choices=["off", "warn", "strict"], default="warn",
+                        help="Check the host for sources of noise before and between benchmarks; 'strict' refuses "
+                             "to start when the host is outside tolerance")
+    parser.add_argument("--max-load", type=float, default=1.0, help="Maximum tolerated 1-minute load average")
+    parser.add_argument("--max-pressure", type=float, default=5.0,
+                        help="Maximum tolerated CPU, memory or I/O pressure (percentage of time stalled over 10s)")
+    parser.add_argument("--min-available-memory", type=float, default=0.25,
+                        help="Minimum tolerated fraction of memory available")
+    parser.add_argument("--calibration-tolerance", type=float, default=0.05,
+                        help="Maximum tolerated spread or drift of the CPU calibration loop's times")
+    parser.add_argument("--target-ci", type=float,
+                        help="Keep running extra batches of iterations until the relative 95%% confidence interval "
+                             "half-width is at most this fraction (e.g. 0.01 for ±1%%)")
+    parser.add_argument("--ci-scope", choices=["total", "tests"], default="total",
+                        help="Whether --target-ci applies to each benchmark's total time or to every test")
+    parser.add_argument("--batch-iterations", type=int, default=5,
+                        help="Iterations run by each extra Ladybird process in --target-ci mode")
+    parser.add_argument("--max-iterations", type=int, default=100, help="Iteration budget per benchmark in --target-ci mode")
+    parser.add_argument("--max-time", type=float, help="Time budget per benchmark in --target-ci mode, in seconds")
+    parser.add_argument("--executable-b", type=str,
+                        help="Path to a second Ladybird executable to compare against; runs of both are interleaved "
+                             "and recorded as arms A and B of a single results file")
+    parser.add_argument("--ab-unit", choices=["iteration", "benchmark"], default="iteration",
+                        help="Work done by each Ladybird process in A/B mode: a single iteration, or every iteration of a benchmark")
+    parser.add_argument("--ab-order", choices=["alternate", "random"], default="alternate",
+                        help="Interleave A/B runs strictly as ABAB..., or run each A/B pair in a random order")
+    parser.add_argument("--ab-seed", type=int, default=0, help="Seed used by --ab-order random")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Number of benchmarks to run at once, each with its own Ladybird process and server pinned "
+                             "to a disjoint set of CPUs")
+    parser.add_argument("--serve-from", choices=["disk", "memory", "archive"], default="disk",
+                        help="Serve benchmark files from disk on every request, preload them into memory before starting "
+                             "Ladybird, or map the benchmark's pack (see pack.py) from --archive-dir")
+    parser.add_argument("--archive-dir", type=Path, default=Path(__file__).parent / "packed",
+                        help="Directory containing <Benchmark>.pack files for --serve-from archive")
+    parser.add_argument("--server", choices=["serial", "threaded"],
+                        help="HTTP server engine: 'serial' handles one request at a time, as the harness always has, "
+                             "'threaded' uses a bounded worker pool (default: serial, or threaded with --network-profile)")
+    parser.add_argument("--server-workers", type=int, default=16,
+                        help="Number of worker threads used by the threaded server with HTTP/1.0; with HTTP/1.1 every "
+                             "connection gets its own thread")
+    parser.add_argument("--content-encodings", type=str, default="",
+                        help="Precompressed variants (from precompress.py) to serve when the browser accepts them, "
+                             "in order of preference (comma-separated, e.g. 'zstd,gzip')")
+    parser.add_argument("--etags", action="store_true",
+                        help="Send content-hash ETags, computed once at startup, and answer matching If-None-Match with 304")
+    parser.add_argument("--cache-control", choices=list(CACHE_CONTROL_POLICIES), default="none",
+                        help="Cache-Control policy sent with every file: 'no-store', 'revalidate' (no-cache) or 'immutable'")
+    parser.add_argument("--http-version", choices=["1.0", "1.1"],
+                        help="HTTP version spoken by the server; 1.1 keeps connections alive between requests "
+                             "(default: 1.1 for the threaded server, 1.0 for the serial server)")
+    parser.add_argument("--network-profile", choices=list(NETWORK_PROFILES), default="loopback",
+                        help="Emulated latency, jitter and bandwidth applied to every file the server sends")
+    parser.add_argument("--request-timeline", action="store_true",
+                        help="Record the server's timing of every request, attributed to the running test, and write "
+                             "it to <output>.timeline.json")
+    parser.add_argument("--request-timeline-capacity", type=int, default=100000,
+                        help="Number of requests kept per benchmark run by --request-timeline; older ones are dropped")
+    parser.add_argument("--sendfile-threshold", type=int, default=64 * 1024,
+                        help="Files served from disk of at least this many bytes are sent with sendfile()")
+    parser.add_argument("--no-sendfile", action="store_true", help="Always copy file contents through Python buffers")
+
+    args = parser.parse_args()
+    if args.parallel < 1 or args.parallel > len(available_cpus()):
+        parser.error(f"--parallel must be between 1 and the number of available CPUs ({len(available_cpus())})")
+    if args.parallel > 1 and not hasattr(os, "sched_setaffinity"):
+        parser.error("--parallel needs CPU affinity to pin each worker, which this platform does not support")
+    if args.target_ci is not None:
+        if args.target_ci <= 0:
+            parser.error("--target-ci must be positive")
+        if args.batch_iterations < 1 or args.max_iterations < 1:
+            parser.error("--batch-iterations and --max-iterations must be at least 1")
+        if args.executable_b:
+            parser.error("--target-ci cannot be combined with --executable-b")
+        if args.process_per_iteration or args.split_suites:
+            parser.error("--target-ci cannot be combined with --process-per-iteration or --split-suites")
+    if args.executable_b and args.process_per_iteration and args.ab_unit != "iteration":
+        parser.error("--process-per-iteration requires --ab-unit iteration")
+    if not args.executable and not args.coordinator:
+        parser.error("--executable is required")
+    if args.coordinator and args.worker:
+        parser.error("--coordinator and --worker cannot be combined")
+    if args.stream_only and (args.target_ci is not None or args.split_suites or args.npz or args.worker):
+        parser.error("--stream-only cannot be combined with --target-ci, --split-suites, --npz or --worker, which "
+                     "need the results in memory")
+    if args.worker and args.results_db:
+        parser.error("--results-db cannot be combined with --worker; the coordinator records the results")
+    if (args.coordinator or args.worker) and args.target_ci is not None:
+        parser.error("--target-ci cannot be combined with --coordinator or --worker")
+    if args.coordinator and not args.coordinator.rpartition(":")[2].isdigit():
+        parser.error("--coordinator must be a port number, optionally preceded by a host name and a colon")
+    if args.shard_iterations is not None and args.shard_iterations < 1:
+        parser.error("--shard-iterations must be at least 1")
+    if args.executable_b and args.parallel > 1:
+        parser.error("--executable-b runs both builds in alternation and cannot be combined with --parallel")
+    if args.server_workers < 1:
+        parser.error("--server-workers must be at least 1")
+    if args.hang_timeout < 0 or args.retries < 0:
+        parser.error("--hang-timeout and --retries cannot be negative")
+    args.content_encodings = [encoding for encoding in args.content_encodings.split(",") if encoding]
+    for encoding in args.content_encodings:
+        if encoding not in CONTENT_ENCODING_SUFFIXES:
+            parser.error(f"Unknown content encoding: {encoding}")
+    if args.request_timeline_capacity < 1:
+        parser.error("--request-timeline-capacity must be at least 1")
+    # Emulated latency and bandwidth limits are applied in the thread serving each request, so on the serial server
+    # every request would also wait out the delays of the requests before it.
+    if args.server is None:
+        args.server = "serial" if args.network_profile == "loopback" else "threaded"
+    elif args.server == "serial" and args.network_profile != "loopback":
+        parser.error("--network-profile requires the threaded server; the serial one would delay requests one after another")
+    if args.http_version is None:
+        args.http_version = "1.1" if args.server == "threaded" else "1.0"
+    elif args.http_version == "1.1" and args.server == "serial":
+        parser.error("--http-version 1.1 requires the threaded server; a persistent connection would block the serial one")
+
+    benchmarks = {}
+    if args.benchmarks == "all":
+        benchmarks = available_benchmarks
+    else:
+        for benchmark_arg in args.benchmarks.split(","):
+            assert benchmark_arg in available_benchmarks, f"Invalid benchmark argument: {benchmark_arg}"
+            benchmarks[benchmark_arg] = available_benchmarks[benchmark_arg]
+
+    params = []
+    if args.iterations:
+        params.append(("iterationCount", str(args.iterations)))
+
+    executables = {"A": args.executable}
+    if args.executable_b:
+        executables["B"] = args.executable_b
+    ladybird_arguments = {}
+    for arm, executable in executables.items():
+        # A coordinator never starts Ladybird itself; its workers use their own executables.
+        if not args.coordinator and not Path(executable).is_file():
+            print(f"Error: Executable '{executable}' not found.", file=sys.stderr)
+            sys.exit(1)
+        ladybird_arguments[arm] = [
+            executable,
+            "--force-new-process"
+        ]
+        if not args.show_window:
+            ladybird_arguments[arm] += ["--headless=manual"]
+
+    benchmarks_dir = Path(__file__).parent / "benchmarks"
+
+    jobs = []
+    for benchmark in benchmarks:
+        if args.benchmarks != "all" and benchmark not in args.benchmarks.split(","):
+            continue
+        runner_url = available_benchmarks[benchmark]["runner_url"]
+        startup_page = available_benchmarks[benchmark].get("startup_page")
+        page = startup_page or benchmark
+        if args.serve_from == "archive":
+            benchmark_path = args.archive_dir / f"{page}.pack"
+            if not benchmark_path.is_file() and not args.coordinator:
+                print(f"Benchmark pack '{benchmark_path}' not found; create it with pack.py.", file=sys.stderr)
+                sys.exit(1)
+        else:
+            benchmark_path = benchmarks_dir / page
+            if not benchmark_path.exists() and not args.coordinator:
+                print(f"Benchmark '{page}' not found in benchmarks directory.", file=sys.stderr)
+                sys.exit(1)
+        iterations = args.iterations or available_benchmarks[benchmark]["default_iterations"]
+        job = {"benchmark": benchmark, "path": benchmark_path, "runner_url": runner_url, "params": params,
+               "iterations": iterations, "startup": startup_page is not None,
+               "suite_parameter": available_benchmarks[benchmark].get("suite_parameter")}
+        suite_jobs = [job]
+        if args.split_suites and job["suite_parameter"]:
+            split_benchmarks[benchmark] = {
+                "suites": default_suites(read_benchmark_file(benchmark_path, available_benchmarks[benchmark]["tests_file"])),
+                "geomean_score": available_benchmarks[benchmark]["geomean_score"],
+            }
+            suite_jobs = [with_suite(job, suite) for suite in split_benchmarks[benchmark]["suites"]]
+
+        for job in suite_jobs:
+            if not args.executable_b:
+                job = {**job, "arm": "A", "ladybird_arguments": ladybird_arguments["A"]}
+                if args.process_per_iteration:
+                    jobs += [with_iterations(job, 1)] * iterations
+                else:
+                    jobs.append(job)
+                continue
+
+            process_count = 1
+            if args.ab_unit == "iteration":
+                process_count = iterations
+                job = with_iterations(job, 1)
+            jobs_a = [{**job, "arm": "A", "ladybird_arguments": ladybird_arguments["A"]}] * process_count
+            jobs_b = [{**job, "arm": "B", "ladybird_arguments": ladybird_arguments["B"]}] * process_count
+            jobs += interleave_arms(jobs_a, jobs_b, args.ab_order, args.ab_seed)
+
+    if args.preflight != "off" and not args.coordinator:
+        preflight_environment(args)
+
+    global journal, results_db, event_log, keep_results
+    keep_results = not args.stream_only
+    if args.event_log:
+        event_log = Journal(Path(args.output).with_suffix(".events.jsonl"), args.journal_fsync_interval, append=args.resume)
+        # Relates the monotonic timestamps of the events to wall-clock time.
+        event_log.append({"event": "RunStart", "time": time.monotonic(), "wall_time": time.time(), "resumed": args.resume})
+
+    if args.worker:
+        try:
+            run_worker(jobs, args)
+        finally:
+            if event_log is not None:
+                event_log.close()
+        return
+
+    # A coordinator's executables are the workers', which report their own metadata.
+    metadata = run_metadata(args, {} if args.coordinator else executables)
+
+    if args.results_db:
+        # Resumed iterations are streamed into a new run; the interrupted one is left incomplete.
+        from results_db import ResultsDatabase
+        results_db = ResultsDatabase(args.results_db)
+        run_name = args.run_name or f"{Path(args.output).stem}-{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        started_at = time.time()
+        try:
+            for arm, executable in executables.items():
+                results_db_runs[arm] = results_db.begin_run(run_name, arm, executable and Path(executable).resolve(),
+                                                            started_at, source=str(Path(args.output).resolve()))
+        except ValueError as e:
+            print(f"Error: {e}.", file=sys.stderr)
+            sys.exit(1)
+
+    journal_path = Path(args.output).with_suffix(".journal.jsonl")
+    if args.resume:
+        if not journal_path.is_file():
+            print(f"Error: No journal '{journal_path}' to resume from.", file=sys.stderr)
+            sys.exit(1)
+        completed_iterations = {}
+        for record in Journal.read(journal_path):
+            record_iteration(record)
+            key = (record["arm"], record["benchmark"], record.get("suite"))
+            completed_iterations[key] = completed_iterations.get(key, 0) + 1
+        print(f"Resumed {sum(completed_iterations.values())} completed iterations from '{journal_path}'")
+        jobs = remaining_jobs(jobs, completed_iterations, keep_finished=bool(args.target_ci))
+    journal = Journal(journal_path, args.journal_fsync_interval, append=args.resume)
+
+    try:
+        if args.coordinator:
+            run_coordinator(jobs, args)
+        else:
+            run_jobs(jobs, args)
+    finally:
+        journal.close()
+        if event_log is not None:
+            event_log.close()
+    append_unmerged_suite_iterations()
+    if results_db is not None:
+        for run_id in results_db_runs.values():
+            results_db.complete_run(run_id)
+        results_db.close()
+
+    for arm, results in arm_results.items():
+        if args.executable_b:
+            print()
+            print(f"Arm {arm}: {executables[arm]}")
+        print_summary(results["test_results"], results["benchmark_totals"])
+        print_phase_summary(results.get("phases", {}))
+
+    if args.executable_b:
+        results_data = {
+            "arms": {
+                arm: {"executable": executables[arm],
+                      **export_results(arm_results.get(arm, {"test_results": {}, "benchmark_totals": {}}))}
+                for arm in executables
+            },
+            "ab": {"unit": args.ab_unit, "order": args.ab_order, "seed": args.ab_seed},
+        }
+    else:
+        results_data = export_results(arm_results["A"])
+        results_data.setdefault("phases", {})
+    if args.target_ci:
+        results_data["adaptive"] = {
+            "target_ci": args.target_ci,
+            "scope": args.ci_scope,
+            "benchmarks": adaptive_results,
+        }
+
     with open(args.output, "w") as f:
         json.dump({
-            "test_results": test_results,
-            "benchmark_totals": benchmark_totals
+            **results_data,
+            "server_stats": server_stats,
+            "network": {"profile": args.network_profile, **NETWORK_PROFILES[args.network_profile]},
+            "jobs": job_records,
+            "failures": failures,
+            "metadata": {
+                **metadata,
+                "environment": environment_samples,
+                **({"workers": worker_metadata} if args.coordinator else {}),
+            },
         }, f, indent=4)
 
+    if args.request_timeline:
+        timeline_path = Path(args.output).with_suffix(".timeline.json")
+        with open(timeline_path, "w") as f:
+            json.dump(request_timelines, f, indent=4)
+
+    if args.npz:
+        write_npz(Path(args.output).with_suffix(".npz"), {arm: arm_results.get(arm, {"test_results": {}, "benchmark_totals": {}})
+                                                         for arm in executables},
+                  datetime.datetime.now(datetime.timezone.utc).isoformat())
+
+    final_failures = [failure for failure in failures if not failure["retried"]]
+    if final_failures:
+        reasons = sorted({failure["reason"] for failure in final_failures})
+        print(f"Error: Some benchmarks failed ({', '.join(reasons)}) and ran out of retries; see the failures section of "
+              f"the results.", file=sys.stderr)
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
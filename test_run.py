@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import unittest
+
+from run import append_results
+
+
+def speedometer_iteration(suite_totals):
+    """Build an /IterationComplete payload shaped like the one Speedometer2 and Speedometer3 send."""
+    tests = {}
+    for suite, steps in suite_totals.items():
+        suite_tests = {test: {"tests": {"Sync": sync, "Async": async_time}, "total": sync + async_time}
+                       for test, (sync, async_time) in steps.items()}
+        tests[suite] = {"tests": suite_tests, "total": sum(test["total"] for test in suite_tests.values())}
+    total = sum(suite["total"] for suite in tests.values())
+    return {"tests": tests, "total": total, "mean": total, "geomean": total, "score": 1000 / total}
+
+
+class AppendResultsTest(unittest.TestCase):
+    def test_records_every_level_of_speedometer_results(self):
+        destination = {"test_results": {}, "benchmark_totals": {}}
+        for sync in (10.0, 20.0):
+            append_results(destination, "Speedometer3", speedometer_iteration({
+                "TodoMVC-React": {"Adding100Items": (sync, 2.0), "CompletingAllItems": (3.0, 1.0)},
+            }))
+
+        measurements = destination["measurements"]
+        self.assertEqual(measurements[("Speedometer3", "TodoMVC-React")], [16.0, 26.0])
+        self.assertEqual(measurements[("Speedometer3", "TodoMVC-React", "Adding100Items")], [12.0, 22.0])
+        self.assertEqual(measurements[("Speedometer3", "TodoMVC-React", "Adding100Items", "Sync")], [10.0, 20.0])
+        self.assertEqual(measurements[("Speedometer3", "TodoMVC-React", "Adding100Items", "Async")], [2.0, 2.0])
+        self.assertEqual(measurements[("Speedometer3", "TodoMVC-React", "CompletingAllItems", "Sync")], [3.0, 3.0])
+        self.assertEqual(destination["test_results"]["Speedometer3"]["TodoMVC-React"]["Adding100Items"], [12.0, 22.0])
+        self.assertEqual(destination["benchmark_totals"]["Speedometer3"]["totalTime"], [16.0, 26.0])
+
+
+if __name__ == "__main__":
+    unittest.main()